@@ -1,2 +1,134 @@
-def check_api_quota():
-    print("✅ API quota check: OK")
\ No newline at end of file
+import sqlite3
+import threading
+import math
+import time
+from datetime import date, datetime, timedelta
+
+from config import (
+    API_USAGE_FILE, API_RATE_PER_SECOND, API_BURST, API_DAILY_QUOTA,
+    API_LIMIT_MODE, API_MAX_WAIT_SECONDS
+)
+
+# Token bucket + per-day call counters, kept in SQLite so every thread and
+# worker process draws from the same budget. BEGIN IMMEDIATE serializes the
+# read-modify-write of the bucket across processes.
+
+_local = threading.local()
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        # Whole seconds until a call could succeed, for a Retry-After header.
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class DailyQuotaExceeded(QuotaExceeded):
+    # Unlike a rate-limit wait, this won't clear until tomorrow.
+    pass
+
+
+def _seconds_until_tomorrow():
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(API_USAGE_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS daily_usage ("
+            " day TEXT PRIMARY KEY, calls INTEGER NOT NULL DEFAULT 0, rejected INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("INSERT OR IGNORE INTO bucket (id, tokens, updated) VALUES (1, ?, ?)", (API_BURST, time.time()))
+        _local.conn = conn
+    return conn
+
+
+def _refill(tokens, updated, now):
+    return min(API_BURST, tokens + (now - updated) * API_RATE_PER_SECOND)
+
+
+def _try_acquire(cost):
+    # Returns 0 when the call may proceed, otherwise the seconds until it could.
+    conn = _connect()
+    today = date.today().isoformat()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR IGNORE INTO daily_usage (day) VALUES (?)", (today,))
+        calls = conn.execute("SELECT calls FROM daily_usage WHERE day = ?", (today,)).fetchone()[0]
+        if calls + cost > API_DAILY_QUOTA:
+            conn.execute("UPDATE daily_usage SET rejected = rejected + 1 WHERE day = ?", (today,))
+            conn.execute("COMMIT")
+            raise DailyQuotaExceeded(
+                f"Daily API quota of {API_DAILY_QUOTA} calls used up", _seconds_until_tomorrow()
+            )
+
+        now = time.time()
+        tokens, updated = conn.execute("SELECT tokens, updated FROM bucket WHERE id = 1").fetchone()
+        tokens = _refill(tokens, updated, now)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+            conn.execute("UPDATE daily_usage SET calls = calls + ? WHERE day = ?", (cost, today))
+        else:
+            wait = (cost - tokens) / API_RATE_PER_SECOND
+        conn.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 1", (tokens, now))
+        conn.execute("COMMIT")
+        return wait
+    except QuotaExceeded:
+        raise
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def check_api_quota(cost=1, mode=None):
+    mode = mode or API_LIMIT_MODE
+    deadline = time.monotonic() + API_MAX_WAIT_SECONDS
+    while True:
+        wait = _try_acquire(cost)
+        if not wait:
+            print("✅ API quota check: OK")
+            return True
+        if mode == "fail_fast" or time.monotonic() + wait > deadline:
+            _connect().execute(
+                "UPDATE daily_usage SET rejected = rejected + 1 WHERE day = ?", (date.today().isoformat(),)
+            )
+            raise QuotaExceeded(f"API rate limit reached; next call possible in {wait:.1f}s", wait)
+        time.sleep(wait)
+
+
+def get_usage(day=None):
+    conn = _connect()
+    day = day or date.today().isoformat()
+    row = conn.execute("SELECT calls, rejected FROM daily_usage WHERE day = ?", (day,)).fetchone()
+    calls, rejected = row if row else (0, 0)
+    tokens, updated = conn.execute("SELECT tokens, updated FROM bucket WHERE id = 1").fetchone()
+    tokens = _refill(tokens, updated, time.time())
+    return {
+        "day": day,
+        "calls": calls,
+        "rejected": rejected,
+        "daily_quota": API_DAILY_QUOTA,
+        "remaining_today": max(0, API_DAILY_QUOTA - calls),
+        "tokens_available": round(tokens, 2),
+        "rate_per_second": API_RATE_PER_SECOND,
+        "burst": API_BURST,
+        "seconds_until_token": round(max(0.0, 1 - tokens) / API_RATE_PER_SECOND, 2),
+    }
+
+
+def usage_history(days=7):
+    start = (date.today() - timedelta(days=days - 1)).isoformat()
+    rows = _connect().execute(
+        "SELECT day, calls, rejected FROM daily_usage WHERE day >= ? ORDER BY day", (start,)
+    )
+    return [{"day": day, "calls": calls, "rejected": rejected} for day, calls, rejected in rows]
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import guest_store
+from config import BATCH_SCAN_WORKERS
+from guest_notes import get_shared_notes
+from guest_service import guest_record
+from search_cache import cached_guest_search
+
+# Header spellings seen in Resy / OpenTable / Tock exports.
+COLUMN_ALIASES = {
+    "name": "name", "guest": "name", "guest name": "name", "diner": "name", "diner name": "name",
+    "email": "email", "email address": "email", "guest email": "email",
+    "phone": "phone", "phone number": "phone", "mobile": "phone",
+    "party_size": "party_size", "party size": "party_size", "party": "party_size",
+    "covers": "party_size", "guests": "party_size",
+    "location": "location", "restaurant": "location", "restaurant_id": "location",
+}
+
+
+def _normalize_row(row):
+    normalized = {}
+    for key, value in row.items():
+        field = COLUMN_ALIASES.get((key or "").strip().lower())
+        if field and field not in normalized:
+            normalized[field] = str(value if value is not None else "").strip()
+    return normalized
+
+
+def read_reservations(text, fmt):
+    if fmt == "csv":
+        rows = csv.DictReader(io.StringIO(text))
+    elif fmt == "jsonl":
+        rows = (json.loads(line) for line in text.splitlines() if line.strip())
+    else:
+        raise ValueError(f"Unsupported reservation format: {fmt}")
+    yield from normalize_reservations(rows)
+
+
+def normalize_reservations(rows):
+    # rows are dicts keyed by any of the export header spellings.
+    for number, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Row {number} is not an object")
+        row = _normalize_row(row)
+        if row.get("name"):
+            yield row
+
+
+def _search(row):
+    return cached_guest_search(row["name"], row.get("email", ""), row.get("phone", ""))
+
+
+def scan_reservations(reservations, location, max_workers=None):
+    rows = list(reservations)
+    with ThreadPoolExecutor(max_workers=max_workers or BATCH_SCAN_WORKERS) as pool:
+        futures = [pool.submit(_search, row) for row in rows]
+
+    summary, records = [], {}
+    for row, future in zip(rows, futures):
+        name = row["name"]
+        try:
+            guest_profile = future.result()
+        except Exception as e:
+            summary.append({"name": name, "status": "failed", "error": str(e)})
+            continue
+        record = guest_record(
+            row.get("email", ""), row.get("phone", ""), row.get("party_size", ""),
+            guest_profile, get_shared_notes(name)
+        )
+        records[name] = (record, row.get("location") or location)
+        summary.append({
+            "name": name,
+            "status": "scanned",
+            "risk_score": record["risk_score"],
+            "star_rating": record["star_rating"],
+            "matched_platforms": record["matched_platforms"],
+        })
+
+    # One transaction for the whole export instead of a DB write per guest.
+    with guest_store.transaction():
+        for name, (record, visit_location) in records.items():
+            guest_store.upsert_guest(name, record)
+            guest_store.record_visit(name, visit_location)
+
+    scanned = sum(1 for entry in summary if entry["status"] == "scanned")
+    return {
+        "scanned": scanned,
+        "failed": len(summary) - scanned,
+        "guests": summary,
+    }
@@ -0,0 +1,88 @@
+import difflib
+import os
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from config import OCR_PREPROCESS
+from ocr_utils import extract_text, iter_image_files
+
+# Usage: python bench_ocr.py [folder]
+# Without a folder, synthetic reservation screenshots are rendered. A folder
+# should hold images with a same-named .txt file carrying the expected text.
+
+SAMPLE_RESERVATIONS = [
+    ["Resy", "Guest: Maria Lopez", "maria.lopez@example.com", "(415) 555-0142", "Party of 4"],
+    ["OpenTable", "Name: Daniel Kim", "dkim88@example.net", "212-555-0199", "Table for 2"],
+    ["Tock", "Guest Name: Priya Shah", "priya.shah@example.org", "617.555.0123", "6 guests"],
+]
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 only ships the small bitmap font
+        return ImageFont.load_default()
+
+
+def synthetic_samples(count=12):
+    font = _font(48)
+    for index in range(count):
+        lines = SAMPLE_RESERVATIONS[index % len(SAMPLE_RESERVATIONS)]
+        dark = index % 4 == 3
+        # Large, mostly empty, high-DPI canvas like a retina phone screenshot.
+        image = Image.new("RGB", (2400, 4000), (18, 18, 24) if dark else (250, 248, 240))
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(lines):
+            draw.text((300, 1200 + row * 90), line, fill=(235, 235, 235) if dark else (30, 30, 30), font=font)
+        image.info["dpi"] = (460, 460)
+        yield f"synthetic_{index:02d}", image, "\n".join(lines)
+
+
+def folder_samples(directory):
+    for label, path in iter_image_files(directory):
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(truth_path):
+            continue
+        with open(truth_path, "r") as f:
+            truth = f.read()
+        image = Image.open(path)
+        image.load()
+        yield label, image, truth
+
+
+def _normalize(text):
+    return " ".join(text.split()).lower()
+
+
+def run(samples, options):
+    elapsed, scores = 0.0, []
+    for _, image, truth in samples:
+        start = time.perf_counter()
+        text = extract_text(image, options)
+        elapsed += time.perf_counter() - start
+        scores.append(difflib.SequenceMatcher(None, _normalize(truth), _normalize(text)).ratio())
+    return elapsed, scores
+
+
+def main(argv):
+    samples = list(folder_samples(argv[1]) if len(argv) > 1 else synthetic_samples())
+    if not samples:
+        print("No images with ground-truth .txt files found.")
+        return
+    modes = [
+        ("raw", None),
+        ("preprocessed", dict(OCR_PREPROCESS, enabled=True)),
+    ]
+    for mode, options in modes:
+        elapsed, scores = run(samples, options)
+        print(
+            f"ocr.{mode:<13} images={len(samples):<4} "
+            f"mean_ms={elapsed * 1000 / len(samples):9.1f} "
+            f"accuracy={sum(scores) / len(scores):.3f} min_accuracy={min(scores):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
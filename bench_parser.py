@@ -0,0 +1,99 @@
+import os
+import random
+import re
+import sys
+import time
+
+from reservation_parser import parse_reservation_text
+
+# Usage: python bench_parser.py [corpus_folder]
+# The corpus is a folder of OCR text dumps (*.txt). Without one, a synthetic
+# corpus covering the Resy, OpenTable, Tock and generic layouts is generated.
+
+FIRST_NAMES = ["Maria", "Daniel", "Priya", "Ann", "Marcus", "Yuki", "Omar", "Claire"]
+LAST_NAMES = ["Lopez", "Kim", "Shah", "Lee", "Brown", "Tanaka", "Haddad", "Dubois"]
+LAYOUTS = {
+    "resy": ["Resy", "Reservation for {name}", "{email}", "{phone}", "Party of {party}"],
+    "opentable": ["OpenTable", "Diner: {name}", "Party size: {party}", "Email: {email}", "{phone}"],
+    "tock": ["Tock", "Booked by {name}", "{party} guests", "{email}", "{phone}"],
+    "generic": ["Guest Name: {name}", "Table for {party}", "{email}", "{phone}"],
+    # Several fields on one line, as OCR often joins them.
+    "resy_joined": ["Resy", "Reservation for {name}", "{email} {phone}", "Party of {party}"],
+    "opentable_joined": ["OpenTable", "Diner: {name}", "Table for {party} - {phone}", "Email: {email}"],
+    "generic_joined": ["Guest Name: {name}", "{email} {phone} party of {party}"],
+}
+NOISE = ["Time: 7:30 PM", "Special requests: window seat", "Confirmed", "Sat, Oct 18", "Dining room"]
+
+
+def synthetic_corpus(count=5000, seed=7):
+    rng = random.Random(seed)
+    for _ in range(count):
+        layout = LAYOUTS[rng.choice(list(LAYOUTS))]
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        values = {
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{rng.randint(1, 99)}@example.com",
+            "phone": f"({rng.randint(200, 989)}) 555-{rng.randint(0, 9999):04d}",
+            "party": rng.randint(1, 12),
+        }
+        lines = [line.format(**values) for line in layout]
+        for _ in range(rng.randint(2, 6)):
+            lines.insert(rng.randint(1, len(lines)), rng.choice(NOISE))
+        yield "\n".join(lines)
+
+
+def folder_corpus(directory):
+    for entry in sorted(os.listdir(directory)):
+        if entry.endswith(".txt"):
+            with open(os.path.join(directory, entry), "r") as f:
+                yield f.read()
+
+
+def legacy_parse(text):
+    # The field loop upload_screenshot() used before reservation_parser existed.
+    name, email, phone, party_size = "", "", "", ""
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if not email and "@" in line and "." in line:
+            email = line
+        if not phone and re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line):
+            phone = re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line).group(1)
+        if not party_size and re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()):
+            party_size = re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()).group(2)
+        if not name and any(word in line.lower() for word in ["guest", "name", "resy"]):
+            parts = line.split(":")
+            if len(parts) > 1:
+                name = parts[-1].strip()
+    return {"name": name, "email": email, "phone": phone, "party_size": party_size}
+
+
+def run(parser, corpus, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    complete = sum(all(result[field] for field in ("name", "email", "phone", "party_size")) for result in results)
+    return best, complete
+
+
+def main(argv):
+    corpus = list(folder_corpus(argv[1]) if len(argv) > 1 else synthetic_corpus())
+    if not corpus:
+        print("Corpus is empty.")
+        return
+    size_mb = sum(len(text.encode("utf-8")) for text in corpus) / 1e6
+    for label, parser in [("legacy", legacy_parse), ("templates", parse_reservation_text)]:
+        elapsed, complete = run(parser, corpus)
+        print(
+            f"parser.{label:<10} docs={len(corpus):<6} "
+            f"docs_per_s={len(corpus) / elapsed:10.0f} mb_per_s={size_mb / elapsed:7.2f} "
+            f"all_fields={complete / len(corpus):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Usage: python bench_startup.py [module ...]     (default: web_main main)
+# Measures cold-start import cost of the entry points. Each run is a fresh
+# interpreter with `python -X importtime`; the slowest imports by cumulative
+# time are listed so regressions in the startup path are easy to spot.
+
+DEFAULT_MODULES = ["web_main", "main"]
+RUNS = 5
+TOP = 12
+
+
+def import_once(module, data_dir):
+    env = dict(os.environ, CONTROLL_DATA_DIR=data_dir, CONTROLL_METRICS_CSV="0")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+        raise RuntimeError(error)
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def parse_importtime(stderr):
+    # "import time:  self [us] | cumulative | imported package"
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return imports
+
+
+def main(argv):
+    modules = argv[1:] or DEFAULT_MODULES
+    with tempfile.TemporaryDirectory(prefix="controll-startup-") as data_dir:
+        for module in modules:
+            try:
+                runs = [import_once(module, data_dir) for _ in range(RUNS)]
+            except RuntimeError as e:
+                print(f"startup.{module:<10} error: {e}")
+                continue
+            wall = statistics.median(elapsed for elapsed, _ in runs)
+            imports = runs[-1][1]
+            total_us = imports.get(module, (0, 0))[1]
+            print(f"startup.{module:<10} wall_ms={wall * 1000:8.1f} import_ms={total_us / 1000:8.1f} modules={len(imports)}")
+            slowest = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)
+            for name, (self_us, cumulative_us) in slowest[:TOP]:
+                print(f"    {name.strip():<32} cumulative_ms={cumulative_us / 1000:8.1f} self_ms={self_us / 1000:7.1f}")
+            heavy = [name for name in ("PIL", "pytesseract", "numpy") if name in imports]
+            print(f"    heavy imports: {', '.join(heavy) or 'none'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
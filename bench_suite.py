@@ -0,0 +1,145 @@
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Usage: python bench_suite.py [sizes]     e.g. python bench_suite.py 1000,10000,1000000
+# Times the guest DB and the per-guest hot paths against synthetic guest DBs of
+# each size and writes one fixed-width line per (benchmark, size) to
+# bench_output.txt, so two runs can be compared with a plain diff.
+# Runs against a throwaway data directory, never the real guest DB.
+
+os.environ["CONTROLL_DATA_DIR"] = tempfile.mkdtemp(prefix="controll-bench-")
+
+import guest_store  # noqa: E402  (must follow the data dir override)
+from bench_parser import synthetic_corpus  # noqa: E402
+from review_matcher import analyze_review_text  # noqa: E402
+from reservation_parser import parse_reservation_text  # noqa: E402
+from star_rating import get_star_rating  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+OUTPUT_FILE = "bench_output.txt"
+SEED = 7
+REPEAT = 3
+
+FIRST_NAMES = ["Maria", "Daniel", "Priya", "Ann", "Marcus", "Yuki", "Omar", "Claire", "Lena", "Tom"]
+LAST_NAMES = ["Lopez", "Kim", "Shah", "Lee", "Brown", "Tanaka", "Haddad", "Dubois", "Novak", "Reyes"]
+LOCATIONS = ["r001", "r002", "r003", "r004"]
+KEYWORDS = ["rude", "refund", "chargeback", "allergy", "no-show", "loud", "complaint", "influencer"]
+PLATFORMS = ["Yelp", "Google", "TripAdvisor", "Reddit", "TikTok"]
+REVIEWS = [
+    "Absolutely awful service, the host ignored us for twenty minutes.",
+    "Food was fine but I expected more for the price. Will not return.",
+    "The manager was rude when I asked for a refund on my cold pasta.",
+    "Lovely evening, great wine list, slightly slow kitchen.",
+    "Worst birthday dinner ever. I am telling everyone I know about this place.",
+]
+NOTES = ["Prefers booth seating", "Asked for manager", "Disputed the bill", "Regular on Fridays", "VIP"]
+
+
+def synthetic_guest(rng, index):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index:07d}"
+    risk_score = rng.randint(0, 100)
+    visits = [
+        {
+            "timestamp": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                         f"{rng.randint(11, 22):02d}:{rng.randint(0, 59):02d}:00",
+            "location": rng.choice(LOCATIONS),
+        }
+        for _ in range(rng.randint(1, 12))
+    ]
+    aliases = [
+        {"alias": f"@{name.split()[0].lower()}{rng.randint(1, 999)}", "text": rng.choice(REVIEWS), "verified": True}
+        for _ in range(rng.choice([0, 0, 0, 1, 2]))
+    ]
+    return name, {
+        "email": f"guest{index}@example.com",
+        "phone": f"({rng.randint(200, 989)}) 555-{rng.randint(0, 9999):04d}",
+        "party_size": str(rng.randint(1, 12)),
+        "risk_score": risk_score,
+        "style_match": rng.randint(0, 100),
+        "keywords": rng.sample(KEYWORDS, rng.randint(0, 3)),
+        "star_rating": get_star_rating(risk_score),
+        "notes": " | ".join(rng.sample(NOTES, rng.randint(0, 3))),
+        "matched_platforms": rng.sample(PLATFORMS, rng.randint(0, 2)),
+        "alias_reviews": aliases,
+        "visit_history": visits,
+    }
+
+
+def synthetic_guest_db(count, seed=SEED):
+    rng = random.Random(seed)
+    return dict(synthetic_guest(rng, index) for index in range(count))
+
+
+def best_of(fn, repeat=REPEAT, setup=None):
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _drop_load_cache():
+    guest_store._cache["version"] = None
+
+
+def bench_size(size):
+    guest_store.replace_all({})
+    db = synthetic_guest_db(size)
+    rng = random.Random(SEED)
+    results = []
+
+    # First save pays for moving visit_history into the visit log.
+    results.append(("db.save_initial", best_of(lambda: guest_store.replace_all(db), repeat=1)))
+    stored = guest_store.load_all()
+    changed = dict(stored)
+    for name in rng.sample(list(changed), max(1, size // 100)):
+        changed[name] = dict(changed[name], notes=changed[name]["notes"] + " | bench")
+    results.append(("db.save_1pct", best_of(lambda: guest_store.replace_all(changed), repeat=1)))
+    results.append(("db.save_unchanged", best_of(lambda: guest_store.replace_all(changed))))
+    results.append(("db.load_cold", best_of(guest_store.load_all, setup=_drop_load_cache)))
+    results.append(("db.load_warm", best_of(guest_store.load_all)))
+
+    # /queue: the legacy whole-DB body and the first keyset page.
+    results.append(("queue.full_json", best_of(lambda: json.dumps(changed))))
+    results.append(("queue.page_json", best_of(
+        lambda: json.dumps(dict(guest_store.query_guests(limit=51)))
+    )))
+
+    corpus = list(synthetic_corpus(size, seed=SEED))
+    results.append(("parser.fields", best_of(lambda: [parse_reservation_text(text) for text in corpus])))
+    reviews = [rng.choice(REVIEWS) for _ in range(size)]
+    results.append(("review.analyze", best_of(lambda: [analyze_review_text(text) for text in reviews])))
+    scores = [rng.randint(0, 100) for _ in range(size)]
+    results.append(("stars.rating", best_of(lambda: [get_star_rating(score) for score in scores])))
+    return results
+
+
+def format_line(name, size, seconds):
+    return f"{name:<18} n={size:<8} total_ms={seconds * 1000:12.3f} per_item_us={seconds * 1e6 / size:10.3f}"
+
+
+def main(argv):
+    sizes = [int(size) for size in argv[1].split(",")] if len(argv) > 1 else DEFAULT_SIZES
+    lines = [f"# bench_suite sizes={','.join(map(str, sizes))} seed={SEED} repeat={REPEAT}"]
+    for size in sizes:
+        for name, seconds in bench_size(size):
+            line = format_line(name, size, seconds)
+            print(line)
+            lines.append(line)
+    with open(OUTPUT_FILE, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    shutil.rmtree(os.environ["CONTROLL_DATA_DIR"], ignore_errors=True)
+    print(f"Wrote {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
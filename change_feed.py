@@ -0,0 +1,75 @@
+import collections
+import threading
+import time
+
+import guest_store
+from config import EVENTS_POLL_SECONDS, EVENTS_BUFFER_SIZE, EVENTS_MAX_STREAMS
+
+# One poller thread per process reads new guest_events rows and wakes every
+# /events stream waiting on it, so the database sees one query per poll no
+# matter how many host-stand devices are connected. Recent events are kept in
+# memory; a client resuming from further back is served from the table.
+
+POLL_BATCH = 500
+
+_cond = threading.Condition()
+_recent = collections.deque(maxlen=EVENTS_BUFFER_SIZE)
+_state = {"seq": None, "thread": None, "streams": 0}
+
+
+def _poll():
+    while True:
+        try:
+            events = guest_store.events_since(_state["seq"], POLL_BATCH)
+        except Exception as e:
+            print(f"❌ Change feed poll failed: {e}")
+            events = []
+        if events:
+            with _cond:
+                _recent.extend(events)
+                _state["seq"] = events[-1]["seq"]
+                _cond.notify_all()
+        if len(events) < POLL_BATCH:
+            time.sleep(EVENTS_POLL_SECONDS)
+
+
+def open_stream():
+    # Claims one of this worker's EVENTS_MAX_STREAMS slots; False when all are taken.
+    with _cond:
+        if _state["streams"] >= EVENTS_MAX_STREAMS:
+            return False
+        _state["streams"] += 1
+        return True
+
+
+def close_stream():
+    with _cond:
+        _state["streams"] -= 1
+
+
+def latest_seq():
+    # Starts the poller on first use and returns the newest seq it has seen.
+    with _cond:
+        if _state["thread"] is None:
+            _state["seq"] = guest_store.event_range()[1]
+            _state["thread"] = threading.Thread(target=_poll, name="change-feed", daemon=True)
+            _state["thread"].start()
+        return _state["seq"]
+
+
+def missed(after):
+    # True when events after this seq were already pruned (or the seq is from
+    # another database), so the client has to reload instead of resuming.
+    first, last = guest_store.event_range()
+    return after > max(last, latest_seq()) or (first and after < first - 1)
+
+
+def wait_for_events(after, timeout):
+    # Events with seq > after, waiting up to timeout seconds for the first one.
+    latest_seq()
+    with _cond:
+        if not _cond.wait_for(lambda: _state["seq"] > after, timeout):
+            return []
+        if _recent and _recent[0]["seq"] <= after + 1:
+            return [event for event in _recent if event["seq"] > after]
+    return guest_store.events_since(after)
@@ -0,0 +1,308 @@
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+import file_store
+from config import (
+    COLD_MATCH_FILE, COLD_POOL_DIR, COLD_POOL_SEGMENT_BYTES, COLD_POOL_COMPACT_INTERVAL_SECONDS
+)
+
+# The cold match pool is an append-only log split into segment files:
+#   {"op": "add", "seq": 7, "entry": {...}}
+#   {"op": "update", "seq": 7, "fields": {...}}
+#   {"op": "remove", "seq": 7}
+# Every record is idempotent, so triaging an entry is one small append and
+# compaction can fold sealed segments together without touching the active one.
+# Segments are named segment-<first>-<last>.jsonl by the segment numbers they
+# cover; a compacted file covers a range and hides any leftovers inside it.
+
+SEGMENT_RE = re.compile(r"^segment-(\d{6})-(\d{6})\.jsonl$")
+LEGACY_MARKER = ".legacy_imported"
+
+_lock = threading.Lock()
+_state = None
+
+
+def _lock_path():
+    return os.path.join(COLD_POOL_DIR, "pool")
+
+
+def _segment_name(first, last):
+    return f"segment-{first:06d}-{last:06d}.jsonl"
+
+
+def _segments():
+    # Files currently making up the pool, in log order.
+    try:
+        names = os.listdir(COLD_POOL_DIR)
+    except FileNotFoundError:
+        return []
+    ranges = sorted(
+        (int(m.group(1)), -int(m.group(2)), name)
+        for name in names for m in [SEGMENT_RE.match(name)] if m
+    )
+    segments, covered = [], 0
+    for first, neg_last, name in ranges:
+        if -neg_last <= covered:
+            continue  # superseded by a compacted range
+        segments.append((first, -neg_last, name))
+        covered = -neg_last
+    return segments
+
+
+def _new_state():
+    return {
+        "files": {},        # segment name -> bytes already applied
+        "inodes": {},       # segment name -> inode, to notice compacted rewrites
+        "seqs": [],         # add seqs in log order (ascending)
+        "locations": [],    # (segment name, offset) for each seq above
+        "removed": set(),
+        "updates": {},
+        "max_seq": 0,
+    }
+
+
+def _apply(state, name, offset, record):
+    seq = record.get("seq", 0)
+    state["max_seq"] = max(state["max_seq"], seq, record.get("next_seq", 0) - 1)
+    op = record["op"]
+    if op == "add":
+        state["seqs"].append(seq)
+        state["locations"].append((name, offset))
+    elif op == "remove":
+        state["removed"].add(seq)
+    elif op == "update":
+        state["updates"].setdefault(seq, {}).update(record["fields"])
+
+
+def _refresh():
+    # Caller holds _lock. Reads only bytes appended since the last refresh,
+    # unless a compaction replaced or removed files, in which case it rebuilds.
+    global _state
+    try:
+        return _read_new_records()
+    except FileNotFoundError:
+        # Another process compacted while we were reading; start over.
+        _state = None
+        return _read_new_records()
+
+
+def _read_new_records():
+    global _state
+    names = [name for _, _, name in _segments()]
+    inodes = {name: os.stat(os.path.join(COLD_POOL_DIR, name)).st_ino for name in names}
+    if _state is None or any(inodes.get(name) != inode for name, inode in _state["inodes"].items()):
+        _state = _new_state()
+    for name in names:
+        start = _state["files"].get(name, 0)
+        path = os.path.join(COLD_POOL_DIR, name)
+        with open(path, "rb") as f:
+            _state["inodes"][name] = os.fstat(f.fileno()).st_ino
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append; pick it up next time
+                if line.strip():
+                    _apply(_state, name, offset, json.loads(line))
+                offset += len(line)
+        _state["files"][name] = offset
+    return _state
+
+
+def _read_at(name, offset):
+    with open(os.path.join(COLD_POOL_DIR, name), "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+# === Writes ===
+def _append(records):
+    os.makedirs(COLD_POOL_DIR, exist_ok=True)
+    with file_store.file_lock(_lock_path()):
+        with _lock:
+            state = _refresh()
+            records = records(state) if callable(records) else records
+            segments = _segments()
+            if segments and segments[-1][0] == segments[-1][1]:
+                number = segments[-1][1]
+                path = os.path.join(COLD_POOL_DIR, _segment_name(number, number))
+                if os.path.getsize(path) >= COLD_POOL_SEGMENT_BYTES:
+                    number += 1
+            else:
+                number = segments[-1][1] + 1 if segments else 1
+            path = os.path.join(COLD_POOL_DIR, _segment_name(number, number))
+            written = 0
+            with open(path, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                    written += 1
+                f.flush()
+                os.fsync(f.fileno())
+            _refresh()
+    return written
+
+
+def add_entries(entries):
+    # One locked append for the whole batch; returns the new entry ids.
+    # entries may be any iterable and is streamed, never held in memory.
+    _import_legacy()
+    first = None
+
+    def records(state):
+        nonlocal first
+        first = state["max_seq"] + 1
+        return ({"op": "add", "seq": first + i, "entry": entry} for i, entry in enumerate(entries))
+
+    count = _append(records)
+    return range(first, first + count)
+
+
+def remove_entry(seq):
+    _append([{"op": "remove", "seq": seq}])
+
+
+def update_entry(seq, fields):
+    _append([{"op": "update", "seq": seq, "fields": fields}])
+
+
+# === Reads ===
+def _materialize(state, index):
+    seq = state["seqs"][index]
+    record = _read_at(*state["locations"][index])
+    entry = dict(record["entry"], **state["updates"].get(seq, {}))
+    entry["id"] = seq
+    return entry
+
+
+def _read_page(after, limit):
+    state = _refresh()
+    page = []
+    index = bisect.bisect_right(state["seqs"], after)
+    while index < len(state["seqs"]) and len(page) < limit:
+        if state["seqs"][index] not in state["removed"]:
+            page.append(_materialize(state, index))
+        index += 1
+    return page
+
+
+def list_entries(after=0, limit=10):
+    # Keyset page of live entries with id > after; reads only the lines it returns.
+    global _state
+    _import_legacy()
+    with _lock:
+        try:
+            page = _read_page(after, limit)
+        except FileNotFoundError:
+            _state = None
+            page = _read_page(after, limit)
+    next_cursor = page[-1]["id"] if page and len(page) == limit else None
+    return page, next_cursor
+
+
+def get_entry(seq):
+    page, _ = list_entries(seq - 1, limit=1)
+    if page and page[0]["id"] == seq:
+        return page[0]
+    return None
+
+
+def pool_size():
+    _import_legacy()
+    with _lock:
+        state = _refresh()
+        return len(state["seqs"]) - len(state["removed"].intersection(state["seqs"]))
+
+
+# === Compaction ===
+def compact():
+    if not os.path.isdir(COLD_POOL_DIR):
+        return None
+    with file_store.file_lock(os.path.join(COLD_POOL_DIR, "compact")):
+        with file_store.file_lock(_lock_path()):
+            with _lock:
+                state = _refresh()
+                segments = _segments()
+                if not segments or not (state["removed"] or state["updates"] or len(segments) > 2):
+                    return None
+                # Seal the active segment: new appends go to a fresh one while we work.
+                number = segments[-1][1] + 1
+                open(os.path.join(COLD_POOL_DIR, _segment_name(number, number)), "a").close()
+                removed = set(state["removed"])
+                updates = {seq: dict(fields) for seq, fields in state["updates"].items()}
+                next_seq = state["max_seq"] + 1
+
+        first, last = segments[0][0], segments[-1][1]
+        target = os.path.join(COLD_POOL_DIR, _segment_name(first, last))
+        before = sum(os.path.getsize(os.path.join(COLD_POOL_DIR, name)) for _, _, name in segments)
+        kept = dropped = 0
+
+        def write(f):
+            nonlocal kept, dropped
+            f.write(json.dumps({"op": "meta", "next_seq": next_seq}) + "\n")
+            for _, _, name in segments:
+                with open(os.path.join(COLD_POOL_DIR, name), "r") as segment:
+                    for line in segment:
+                        record = json.loads(line)
+                        if record["op"] != "add":
+                            continue
+                        if record["seq"] in removed:
+                            dropped += 1
+                            continue
+                        record["entry"].update(updates.get(record["seq"], {}))
+                        f.write(json.dumps(record) + "\n")
+                        kept += 1
+
+        tmp_path = file_store.write_temp(target, write)
+        after = os.path.getsize(tmp_path)
+        with file_store.file_lock(_lock_path()):
+            os.replace(tmp_path, target)
+            for _, _, name in segments:
+                if name != os.path.basename(target):
+                    os.remove(os.path.join(COLD_POOL_DIR, name))
+            with _lock:
+                _refresh()
+    return {"segments": len(segments), "kept": kept, "dropped": dropped, "bytes_reclaimed": before - after}
+
+
+def start_background_compaction(interval=COLD_POOL_COMPACT_INTERVAL_SECONDS):
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                compact()
+            except Exception as e:
+                print(f"❌ Cold pool compaction failed: {e}")
+
+    thread = threading.Thread(target=loop, name="cold-pool-compactor", daemon=True)
+    thread.start()
+    return thread
+
+
+# === Legacy cold_match_pool.json ===
+def _apply_legacy_change(pool, record):
+    if record["op"] == "add":
+        pool.append(record["entry"])
+    elif record["op"] == "remove" and record["entry"] in pool:
+        pool.remove(record["entry"])
+
+
+def _import_legacy():
+    marker = os.path.join(COLD_POOL_DIR, LEGACY_MARKER)
+    if os.path.exists(marker):
+        return
+    os.makedirs(COLD_POOL_DIR, exist_ok=True)
+    with file_store.file_lock(_lock_path()):
+        if os.path.exists(marker):
+            return
+        legacy = file_store.read_logged(COLD_MATCH_FILE, [], _apply_legacy_change)
+        if legacy and not _segments():
+            path = os.path.join(COLD_POOL_DIR, _segment_name(1, 1))
+            file_store.atomic_write_text(path, "".join(
+                json.dumps({"op": "add", "seq": seq, "entry": entry}) + "\n"
+                for seq, entry in enumerate(legacy, 1)
+            ))
+        file_store.atomic_write_text(marker, COLD_MATCH_FILE + "\n")
@@ -0,0 +1,149 @@
+import os
+
+# === Storage ===
+DATA_DIR = os.environ.get("CONTROLL_DATA_DIR", "")
+
+GUEST_DB_FILE = os.path.join(DATA_DIR, "guest_db.json")
+GUEST_STORE_FILE = os.path.join(DATA_DIR, "guest_db.sqlite3")
+SHARED_FILE = os.path.join(DATA_DIR, "shared_contributions.json")
+COLD_MATCH_FILE = os.path.join(DATA_DIR, "cold_match_pool.json")
+
+# Phone numbers stored without a country code are indexed under this one (E.164).
+DEFAULT_PHONE_COUNTRY_CODE = os.environ.get("CONTROLL_PHONE_COUNTRY_CODE", "1")
+
+# === OCR ===
+OCR_MAX_WORKERS = int(os.environ.get("CONTROLL_OCR_WORKERS", 0)) or os.cpu_count() or 1
+
+# OCR results are cached on disk by image hash; least recently used entries go first.
+OCR_CACHE_DIR = os.path.join(DATA_DIR, "ocr_cache")
+OCR_CACHE_MAX_BYTES = int(os.environ.get("CONTROLL_OCR_CACHE_MB", 64)) * 1024 * 1024
+
+# Applied before tesseract; set CONTROLL_OCR_PREPROCESS=0 to OCR the raw image.
+OCR_PREPROCESS = {
+    "enabled": os.environ.get("CONTROLL_OCR_PREPROCESS", "1") != "0",
+    "grayscale": True,
+    "target_dpi": 300,
+    "max_side": 2400,
+    "crop_to_text": True,
+    "crop_margin": 16,
+}
+
+# Uploads are copied to a spool file in chunks and rejected past this size.
+OCR_UPLOAD_MAX_BYTES = int(os.environ.get("CONTROLL_OCR_UPLOAD_MB", 20)) * 1024 * 1024
+OCR_SPOOL_DIR = os.path.join(DATA_DIR, "ocr_spool")
+# Left-over spool files are removed once their worker exits; files without
+# a worker pid in the name (older versions) once they are this old.
+OCR_SPOOL_MAX_AGE_SECONDS = 3600
+
+# Multi-page TIFF/PDF uploads are OCR'd one page at a time, up to this many pages.
+OCR_MAX_PAGES = int(os.environ.get("CONTROLL_OCR_MAX_PAGES", 50))
+OCR_PDF_DPI = 200
+
+# === Background jobs ===
+JOB_STORE_FILE = os.path.join(DATA_DIR, "jobs.sqlite3")
+JOB_MAX_WORKERS = int(os.environ.get("CONTROLL_JOB_WORKERS", 4))
+JOB_MAX_PENDING = int(os.environ.get("CONTROLL_JOB_MAX_PENDING", 200))
+JOB_TIMEOUT_SECONDS = float(os.environ.get("CONTROLL_JOB_TIMEOUT", 60))
+# Kinds that legitimately run long. A bulk scan is rate limited upstream
+# (API_RATE_PER_SECOND), so a few thousand rows take minutes, not seconds.
+JOB_KIND_TIMEOUT_SECONDS = {
+    "ocr": 300,
+    "scan_batch": float(os.environ.get("CONTROLL_SCAN_BATCH_TIMEOUT", 3600)),
+    "rescore_stars": 1800,
+    "retention": 3600,
+}
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF_SECONDS = 1.0
+
+# === Guest search cache ===
+SEARCH_CACHE_FILE = os.path.join(DATA_DIR, "search_cache.sqlite3")
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("CONTROLL_SEARCH_TTL_HOURS", 7 * 24)) * 3600
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("CONTROLL_SEARCH_CACHE_SIZE", 20000))
+
+# === Upstream API limits ===
+API_USAGE_FILE = os.path.join(DATA_DIR, "api_usage.sqlite3")
+API_RATE_PER_SECOND = float(os.environ.get("CONTROLL_API_RATE", 5))
+API_BURST = float(os.environ.get("CONTROLL_API_BURST", 10))
+API_DAILY_QUOTA = int(os.environ.get("CONTROLL_API_DAILY_QUOTA", 5000))
+# "block" waits (up to API_MAX_WAIT_SECONDS) for a token; "fail_fast" raises at once.
+API_LIMIT_MODE = os.environ.get("CONTROLL_API_LIMIT_MODE", "block")
+API_MAX_WAIT_SECONDS = float(os.environ.get("CONTROLL_API_MAX_WAIT", 30))
+
+# === Bulk reservation scans ===
+BATCH_SCAN_WORKERS = int(os.environ.get("CONTROLL_BATCH_SCAN_WORKERS", 8))
+
+# === Restaurant registry ===
+REGISTRY_FILE = os.path.join(DATA_DIR, "restaurant_registry.json")
+
+# === Cold match pool ===
+COLD_POOL_DIR = os.path.join(DATA_DIR, "cold_match_pool")
+COLD_POOL_SEGMENT_BYTES = 1024 * 1024
+COLD_POOL_COMPACT_INTERVAL_SECONDS = 300
+COLD_POOL_PAGE_SIZE = 10
+
+# === Stage timing metrics ===
+# Set CONTROLL_METRICS=0 to turn the timers into no-ops.
+METRICS_ENABLED = os.environ.get("CONTROLL_METRICS", "1") != "0"
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Optional per-call rows in crawl_log.csv, written in batches of METRICS_CSV_BATCH.
+METRICS_CSV_ENABLED = os.environ.get("CONTROLL_METRICS_CSV", "0") == "1"
+METRICS_CSV_FILE = os.path.join(DATA_DIR, "crawl_log.csv")
+METRICS_CSV_BATCH = 100
+
+# === Batch review analysis ===
+REVIEW_BATCH_WORKERS = int(os.environ.get("CONTROLL_REVIEW_WORKERS", 0)) or os.cpu_count() or 1
+# Reviews per task sent to a worker process; larger chunks mean less IPC.
+REVIEW_BATCH_CHUNK_SIZE = 64
+
+# === Star ratings ===
+# Risk score lower bounds, ascending. Every bound a score reaches costs one
+# star from 5: with 20,40,60,80 a score of 65 gets 2 stars. After changing
+# these, re-score stored guests (CLI option 15 or POST /stars/rescore).
+STAR_RATING_THRESHOLDS = [
+    float(bound) for bound in os.environ.get("CONTROLL_STAR_THRESHOLDS", "20,40,60,80").split(",")
+]
+
+# === Shared notes between locations ===
+SHARED_STORE_FILE = os.path.join(DATA_DIR, "shared_notes.sqlite3")
+# Identifies this site's changelog; must be set, and unique across the group,
+# before syncing. Until then notes are kept locally and never shared.
+SHARED_LOCATION_ID = os.environ.get("CONTROLL_LOCATION_ID", "").strip()
+# Comma-separated peers to sync with: http(s) base URLs of other sites, or
+# directory paths (e.g. a mounted share) that every site publishes into.
+SHARED_SYNC_PEERS = [peer.strip() for peer in os.environ.get("CONTROLL_SYNC_PEERS", "").split(",") if peer.strip()]
+SHARED_SYNC_BATCH = 500
+
+# === HTTP response caching ===
+# Guest-data responses are cached per data version, already compressed.
+HTTP_BODY_CACHE_ENTRIES = int(os.environ.get("CONTROLL_HTTP_CACHE_ENTRIES", 64))
+HTTP_COMPRESS_MIN_BYTES = 1024
+HTTP_GZIP_LEVEL = 6
+
+# === Change feed (/events) ===
+# One poller per web worker checks for new guest events this often.
+EVENTS_POLL_SECONDS = float(os.environ.get("CONTROLL_EVENTS_POLL_SECONDS", 1))
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+# An open stream holds a thread of its web worker for as long as it lasts, so
+# run the web app with a threaded or gevent worker class (e.g. gunicorn
+# -k gthread --threads 32) and keep EVENTS_MAX_STREAMS below the thread count.
+# Past the cap a worker answers 503 and the client retries; every stream ends
+# after EVENTS_STREAM_MAX_SECONDS and resumes by Last-Event-ID, which spreads
+# devices across workers instead of pinning them.
+EVENTS_MAX_STREAMS = int(os.environ.get("CONTROLL_EVENTS_MAX_STREAMS", 16))
+EVENTS_STREAM_MAX_SECONDS = 300
+
+# === Retention ===
+# 0 turns a rule off. Ages are measured from the visit / tag timestamps;
+# alias entries tagged before timestamps were recorded only obey the counts.
+RETENTION_RULES = {
+    "visit_max_age_days": int(os.environ.get("CONTROLL_RETENTION_VISIT_DAYS", 0)),
+    "alias_max_age_days": int(os.environ.get("CONTROLL_RETENTION_ALIAS_DAYS", 0)),
+    "max_alias_reviews": int(os.environ.get("CONTROLL_RETENTION_MAX_ALIAS_REVIEWS", 50)),
+    "max_alias_memory_per_alias": int(os.environ.get("CONTROLL_RETENTION_MAX_ALIAS_MEMORY", 20)),
+    "max_note_segments": int(os.environ.get("CONTROLL_RETENTION_MAX_NOTES", 20)),
+    "inactive_guest_months": int(os.environ.get("CONTROLL_RETENTION_INACTIVE_MONTHS", 0)),
+    "max_events": int(os.environ.get("CONTROLL_RETENTION_MAX_EVENTS", 100000)),
+}
+RETENTION_INTERVAL_SECONDS = 24 * 3600
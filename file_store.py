@@ -0,0 +1,95 @@
+import copy
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-worker only
+    fcntl = None
+
+# A logged JSON file is a snapshot at `path` plus an append-only `path.wal`.
+# The first WAL line names the inode of the snapshot it applies on top of; a
+# WAL whose base no longer matches the snapshot was already folded in. Only
+# read now, by the one-time imports of the legacy JSON files.
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    if fcntl is None:
+        yield
+        return
+    # One lock file per data file, so writers of different files never wait on each other.
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_temp(path, write):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def atomic_write_text(path, text):
+    tmp_path = write_temp(path, lambda f: f.write(text))
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return copy.deepcopy(default)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _snapshot_inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _read_wal(path):
+    wal_path = path + ".wal"
+    if not os.path.exists(wal_path):
+        return []
+    with open(wal_path, "r") as f:
+        lines = f.read().split("\n")
+    if not lines or not lines[0]:
+        return []
+    if json.loads(lines[0]).get("base") != _snapshot_inode(path):
+        return []
+    records = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # torn line from a crash mid-append
+    return records
+
+
+def _replay(path, default, apply):
+    data = read_json(path, default)
+    for record in _read_wal(path):
+        apply(data, record)
+    return data
+
+
+def read_logged(path, default, apply):
+    with file_lock(path, shared=True):
+        return _replay(path, default, apply)
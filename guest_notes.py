@@ -1,5 +1,12 @@
+import shared_sync
+
+
 def get_shared_notes(name):
-    return []
+    # Notes every location has shared about this guest, oldest first, in the
+    # " | "-joined form guest records keep in "notes".
+    return " | ".join(f"[{entry['location']}] {entry['note']}" for entry in shared_sync.notes_for(name))
 
 def add_guest_note(name, note):
-    print(f"Note added for {name}: {note}")
\ No newline at end of file
+    record = shared_sync.add_note(name, note)
+    print(f"Note added for {name}: {note}")
+    return record
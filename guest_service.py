@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import guest_store
+from config import REGISTRY_FILE
+from guest_notes import get_shared_notes
+from search_cache import cached_guest_search
+from star_rating import get_star_rating
+
+# Non-interactive guest operations. The CLI menu prompts and then calls these;
+# the Flask routes call them straight from request data. Nothing here reads
+# stdin, so it is safe to run inside a web worker.
+
+_registry_lock = threading.Lock()
+_registry = {"mtime": None, "data": {}}
+
+
+class UnknownGuest(KeyError):
+    pass
+
+
+# === Restaurant registry ===
+def get_registry():
+    # Parsed once and kept in memory; re-read only when the file changes.
+    try:
+        mtime = os.stat(REGISTRY_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _registry_lock:
+        if _registry["mtime"] != mtime:
+            with open(REGISTRY_FILE, "r") as f:
+                _registry["data"] = json.load(f)
+            _registry["mtime"] = mtime
+        return _registry["data"]
+
+
+def default_restaurant_id():
+    return next(iter(get_registry()), "")
+
+
+def validate_restaurant_id(restaurant_id):
+    registry = get_registry()
+    if registry and restaurant_id not in registry:
+        raise ValueError(f"Unknown restaurant id: {restaurant_id}")
+    return restaurant_id
+
+
+# === Guests ===
+def guest_record(email, phone, party_size, guest_profile, shared_notes):
+    # Visits are not part of the record; callers log them with guest_store.record_visit.
+    risk_score = guest_profile.get("risk_score", 0)
+    return {
+        "email": email,
+        "phone": phone,
+        "party_size": party_size,
+        "risk_score": risk_score,
+        "style_match": guest_profile.get("style_match", 0),
+        "keywords": guest_profile.get("keywords", []),
+        "star_rating": get_star_rating(risk_score),
+        "notes": shared_notes,
+        "matched_platforms": guest_profile.get("matched_platforms", []),
+        "alias_reviews": []
+    }
+
+
+def scan_guest(name, email, phone, party_size, restaurant_id, refresh=False):
+    validate_restaurant_id(restaurant_id)
+    guest_profile = cached_guest_search(name, email, phone, refresh=refresh)
+    record = guest_record(email, phone, party_size, guest_profile, get_shared_notes(name))
+    with guest_store.transaction():
+        guest_store.upsert_guest(name, record)
+        guest_store.record_visit(name, restaurant_id)
+    return record
+
+
+def tag_alias(real_name, alias, review_text, source, note):
+    with guest_store.transaction():
+        guest = guest_store.get_guest(real_name)
+        if guest is None:
+            raise UnknownGuest(real_name)
+
+        tagged_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        guest.setdefault("alias_reviews", []).append({
+            "alias": alias,
+            "text": review_text,
+            "verified": True,
+            "tagged_at": tagged_at
+        })
+        guest.setdefault("alias_memory", {}).setdefault(alias, []).append({
+            "text": review_text,
+            "source": source,
+            "tagged_at": tagged_at
+        })
+        guest["notes"] += " | " + note
+        guest_store.upsert_guest(real_name, guest, event=("alias_tagged", {"alias": alias}))
+    return guest
+
+
+def list_ghosts():
+    return guest_store.guest_names(prefix="ghost_")
+
+
+def convert_ghost(ghost_key, real_name, email, phone, party_size):
+    with guest_store.transaction():
+        ghost_data = guest_store.get_guest(ghost_key)
+        if ghost_data is None:
+            raise UnknownGuest(ghost_key)
+        guest_store.delete_guest(ghost_key)
+        guest_store.move_visits(ghost_key, real_name)
+        guest_data = {
+            "email": email,
+            "phone": phone,
+            "party_size": party_size,
+            "risk_score": ghost_data.get("risk_score", 0),
+            "style_match": ghost_data.get("style_match", 0),
+            "keywords": ghost_data.get("keywords", []),
+            "star_rating": ghost_data.get("star_rating", 3),
+            "notes": f"Converted from ghost guest {ghost_key}",
+            "matched_platforms": [],
+            "alias_reviews": [],
+            "last_review": ghost_data.get("last_review", ""),
+            "tone": ghost_data.get("tone", "Unknown")
+        }
+        guest_store.upsert_guest(real_name, guest_data, event=("converted", {"ghost": ghost_key}))
+    return guest_data
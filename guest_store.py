@@ -0,0 +1,690 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import metrics
+from config import GUEST_DB_FILE, GUEST_STORE_FILE, DEFAULT_PHONE_COUNTRY_CODE
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# An entry is either a SQL script or a function taking the connection, for
+# backfills that need the Python-side normalization. An entry may only rely on
+# the schema as of its own version: never call the write helpers from one,
+# since they maintain tables and columns that later entries add.
+MIGRATIONS = [
+    """
+    CREATE TABLE guests (
+        name TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    """
+    INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+    """,
+    """
+    ALTER TABLE guests ADD COLUMN risk_score INTEGER;
+    ALTER TABLE guests ADD COLUMN star_rating INTEGER;
+    UPDATE guests SET
+        risk_score = json_extract(data, '$.risk_score'),
+        star_rating = json_extract(data, '$.star_rating');
+    CREATE INDEX guests_by_risk ON guests (risk_score, name);
+    CREATE INDEX guests_by_stars ON guests (star_rating, name);
+    CREATE TABLE guest_locations (
+        location TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (location, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX guest_locations_by_name ON guest_locations (name);
+    INSERT OR IGNORE INTO guest_locations (location, name)
+        SELECT json_extract(visit.value, '$.location'), guests.name
+        FROM guests, json_each(guests.data, '$.visit_history') AS visit
+        WHERE json_extract(visit.value, '$.location') IS NOT NULL;
+    """,
+    """
+    CREATE TABLE guest_emails (
+        email TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (email, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX guest_emails_by_name ON guest_emails (name);
+    CREATE TABLE guest_phones (
+        phone TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (phone, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX guest_phones_by_name ON guest_phones (name);
+    CREATE TABLE guest_keywords (
+        keyword TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (keyword, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX guest_keywords_by_name ON guest_keywords (name);
+    """,
+    lambda conn: _reindex_all(conn),
+    # Visits leave the guest record for an append-only log clustered by
+    # (location, day), with per-day and per-guest counters kept alongside it.
+    """
+    CREATE TABLE visits (
+        location TEXT NOT NULL,
+        day TEXT NOT NULL,
+        name TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        PRIMARY KEY (location, day, name, timestamp)
+    ) WITHOUT ROWID;
+    CREATE INDEX visits_by_name ON visits (name, timestamp);
+    CREATE TABLE visit_daily (
+        location TEXT NOT NULL,
+        day TEXT NOT NULL,
+        visits INTEGER NOT NULL,
+        guests INTEGER NOT NULL,
+        PRIMARY KEY (location, day)
+    ) WITHOUT ROWID;
+    CREATE TABLE guest_location_visits (
+        location TEXT NOT NULL,
+        name TEXT NOT NULL,
+        visits INTEGER NOT NULL,
+        first_visit TEXT NOT NULL,
+        last_visit TEXT NOT NULL,
+        PRIMARY KEY (location, name)
+    ) WITHOUT ROWID;
+    CREATE INDEX guest_location_visits_by_name ON guest_location_visits (name);
+    """,
+    # Inline visit_history moves into the log; counters are rebuilt from it.
+    """
+    INSERT OR IGNORE INTO visits (location, day, name, timestamp)
+        SELECT location, substr(timestamp, 1, 10), name, timestamp FROM (
+            SELECT COALESCE(json_extract(visit.value, '$.location'), '') AS location,
+                   COALESCE(json_extract(visit.value, '$.timestamp'), datetime('now', 'localtime')) AS timestamp,
+                   guests.name AS name
+            FROM guests, json_each(guests.data, '$.visit_history') AS visit
+        );
+    DELETE FROM visit_daily;
+    INSERT INTO visit_daily (location, day, visits, guests)
+        SELECT location, day, COUNT(*), COUNT(DISTINCT name) FROM visits GROUP BY location, day;
+    DELETE FROM guest_location_visits;
+    INSERT INTO guest_location_visits (location, name, visits, first_visit, last_visit)
+        SELECT location, name, COUNT(*), MIN(timestamp), MAX(timestamp) FROM visits GROUP BY location, name;
+    UPDATE guests SET data = json_remove(data, '$.visit_history')
+        WHERE json_type(data, '$.visit_history') IS NOT NULL;
+    """,
+    """
+    DROP TABLE guest_locations;
+    """,
+    # Change feed: one row per guest write, committed with the write itself.
+    # AUTOINCREMENT so a seq is never reused after old events are pruned.
+    """
+    CREATE TABLE guest_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        name TEXT NOT NULL,
+        detail TEXT,
+        created_at TEXT NOT NULL
+    );
+    """,
+    # Last visit on the guest row itself, so pruning old visits can't make a
+    # guest look like they never came (and so never inactive).
+    """
+    ALTER TABLE guests ADD COLUMN last_visit TEXT;
+    UPDATE guests SET last_visit =
+        (SELECT MAX(last_visit) FROM guest_location_visits WHERE guest_location_visits.name = guests.name);
+    CREATE INDEX guests_by_last_visit ON guests (last_visit);
+    """,
+]
+
+_local = threading.local()
+
+# Process-wide snapshot for load_all(), invalidated by the meta version counter
+# that every committed write bumps (from any process).
+_cache_lock = threading.Lock()
+_cache = {"version": None, "guests": {}}
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(GUEST_STORE_FILE, timeout=30, isolation_level=None)
+        # WAL lets readers keep serving while a writer commits; commits are atomic.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.depth = 0
+        _local.changed = False
+        try:
+            _migrate(conn)
+        except Exception:
+            _local.conn = None
+            conn.close()
+            raise
+    return conn
+
+
+def _migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    with transaction():
+        # Re-check under the write lock in case another worker got here first.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for script in MIGRATIONS[version:]:
+            if callable(script):
+                script(conn)
+                continue
+            for statement in script.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        if version == 0:
+            import_json_file(GUEST_DB_FILE)
+
+
+@contextmanager
+def transaction():
+    conn = _connect()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
+    _local.changed = False
+    try:
+        yield conn
+        if _local.changed:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _local.depth = 0
+
+
+def _mark_changed():
+    _local.changed = True
+
+
+def data_version():
+    row = _connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+# === One-time JSON import ===
+def import_json_file(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    with open(path, "r") as f:
+        db = json.load(f)
+    with transaction():
+        for name, data in db.items():
+            upsert_guest(name, data)
+        _connect().execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported_from', ?)",
+            (path,)
+        )
+    return len(db)
+
+
+# === Secondary indexes ===
+def normalize_email(email):
+    email = (email or "").strip().lower()
+    return email if "@" in email else None
+
+
+def normalize_phone(phone):
+    # E.164 ("+15551234567"); numbers without a country code get the default one.
+    phone = (phone or "").strip()
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("+") or phone.startswith("00"):
+        digits = digits[2:] if phone.startswith("00") else digits
+    elif len(digits) == 10:
+        digits = DEFAULT_PHONE_COUNTRY_CODE + digits
+    elif not (len(digits) == 11 and digits.startswith(DEFAULT_PHONE_COUNTRY_CODE)):
+        return None
+    return "+" + digits if 8 <= len(digits) <= 15 else None
+
+
+def normalize_keyword(keyword):
+    keyword = " ".join(str(keyword or "").split()).casefold()
+    return keyword or None
+
+
+INDEXES = {
+    # table: (column, values for a record)
+    "guest_emails": ("email", lambda data: [normalize_email(data.get("email"))]),
+    "guest_phones": ("phone", lambda data: [normalize_phone(data.get("phone"))]),
+    "guest_keywords": ("keyword", lambda data: [normalize_keyword(k) for k in data.get("keywords") or []]),
+}
+
+
+def _index_guest(conn, name, data):
+    for table, (column, values) in INDEXES.items():
+        conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+        keys = set(values(data))
+        keys.discard(None)
+        conn.executemany(
+            f"INSERT INTO {table} ({column}, name) VALUES (?, ?)",
+            [(key, name) for key in keys]
+        )
+
+
+def _unindex_guest(conn, name):
+    for table in INDEXES:
+        conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+
+
+def _reindex_all(conn):
+    for name, data in conn.execute("SELECT name, data FROM guests").fetchall():
+        _index_guest(conn, name, json.loads(data))
+
+
+# === Per-guest access ===
+def get_guest(name):
+    row = _connect().execute("SELECT data FROM guests WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0])
+
+
+def _write_guest(conn, name, data, encoded=None, event=None):
+    # event is an (event, detail) pair for the change feed; by default the
+    # write is logged as "added" or "updated".
+    if event is None:
+        exists = conn.execute("SELECT 1 FROM guests WHERE name = ?", (name,)).fetchone()
+        event = ("updated" if exists else "added", None)
+    if "visit_history" in data:
+        # Legacy records carry their visits inline; move them to the log.
+        data = dict(data)
+        for visit in data.pop("visit_history") or []:
+            _append_visit(conn, name, visit.get("location"), visit.get("timestamp"))
+        encoded = None
+    # A new row picks up visits logged under its name before it existed.
+    conn.execute(
+        "INSERT INTO guests (name, data, risk_score, star_rating, last_visit) VALUES (?, ?, ?, ?, "
+        "(SELECT MAX(last_visit) FROM guest_location_visits WHERE name = ?)) "
+        "ON CONFLICT(name) DO UPDATE SET data = excluded.data, "
+        "risk_score = excluded.risk_score, star_rating = excluded.star_rating",
+        (name, encoded or json.dumps(data), data.get("risk_score"), data.get("star_rating"), name)
+    )
+    _index_guest(conn, name, data)
+    kind, detail = event
+    _log_event(conn, kind, name, dict(
+        detail or {}, risk_score=data.get("risk_score"), star_rating=data.get("star_rating")
+    ))
+    _mark_changed()
+
+
+def _remove_guest(conn, name):
+    # Visits stay in the log; they are history, not part of the record.
+    _unindex_guest(conn, name)
+    if conn.execute("DELETE FROM guests WHERE name = ?", (name,)).rowcount == 0:
+        return False
+    _log_event(conn, "removed", name)
+    _mark_changed()
+    return True
+
+
+@metrics.instrument("db_upsert")
+def upsert_guest(name, data, event=None):
+    with transaction() as conn:
+        _write_guest(conn, name, data, event=event)
+
+
+def delete_guest(name):
+    with transaction() as conn:
+        return _remove_guest(conn, name)
+
+
+def guest_names(prefix=""):
+    if not prefix:
+        rows = _connect().execute("SELECT name FROM guests ORDER BY name")
+    else:
+        # Range scan on the primary key instead of LIKE, which can't use the index here.
+        rows = _connect().execute(
+            "SELECT name FROM guests WHERE name >= ? AND name < ? ORDER BY name",
+            (prefix, prefix + "\U0010ffff")
+        )
+    return [row[0] for row in rows]
+
+
+def find_guests(email=None, phone=None, keyword=None):
+    # Index lookups; several criteria must all match.
+    if email is None and phone is None and keyword is None:
+        return []
+    return list(query_guests(email=email, phone=phone, keyword=keyword))
+
+
+def iter_guests():
+    for name, data in _connect().execute("SELECT name, data FROM guests ORDER BY name"):
+        yield name, json.loads(data)
+
+
+def query_guests(min_risk=None, max_risk=None, star_rating=None, location=None,
+                 name_prefix=None, email=None, phone=None, keyword=None,
+                 after=None, limit=None):
+    # Keyset pagination: results are ordered by name and resume after `after`.
+    clauses, params = [], []
+    sql = "SELECT guests.name, guests.data FROM guests"
+    joins = [
+        ("guest_location_visits", "location", location),
+        ("guest_emails", "email", None if email is None else normalize_email(email) or ""),
+        ("guest_phones", "phone", None if phone is None else normalize_phone(phone) or ""),
+        ("guest_keywords", "keyword", None if keyword is None else normalize_keyword(keyword) or ""),
+    ]
+    for table, column, value in joins:
+        if value is not None:
+            sql += f" JOIN {table} ON {table}.name = guests.name"
+            clauses.append(f"{table}.{column} = ?")
+            params.append(value)
+    if min_risk is not None:
+        clauses.append("guests.risk_score >= ?")
+        params.append(min_risk)
+    if max_risk is not None:
+        clauses.append("guests.risk_score <= ?")
+        params.append(max_risk)
+    if star_rating is not None:
+        clauses.append("guests.star_rating = ?")
+        params.append(star_rating)
+    if name_prefix:
+        clauses.append("guests.name >= ? AND guests.name < ?")
+        params.extend([name_prefix, name_prefix + "\U0010ffff"])
+    if after is not None:
+        clauses.append("guests.name > ?")
+        params.append(after)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY guests.name"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    for name, data in _connect().execute(sql, params):
+        yield name, json.loads(data)
+
+
+# === Star ratings ===
+def star_rating_columns():
+    # (names, risk scores, stored ratings) straight from the indexed columns.
+    rows = _connect().execute("SELECT name, risk_score, star_rating FROM guests ORDER BY name").fetchall()
+    if not rows:
+        return [], [], []
+    names, scores, ratings = zip(*rows)
+    return list(names), list(scores), list(ratings)
+
+
+def set_star_ratings(ratings):
+    with transaction() as conn:
+        for name, stars in ratings.items():
+            row = conn.execute("SELECT data FROM guests WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                data = json.loads(row[0])
+                data["star_rating"] = stars
+                _write_guest(conn, name, data)
+
+
+# === Visit log ===
+def _append_visit(conn, name, location, timestamp=None):
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    location, day = location or "", timestamp[:10]
+    new_guest_today = conn.execute(
+        "SELECT 1 FROM visits WHERE location = ? AND day = ? AND name = ? LIMIT 1",
+        (location, day, name)
+    ).fetchone() is None
+    inserted = conn.execute(
+        "INSERT OR IGNORE INTO visits (location, day, name, timestamp) VALUES (?, ?, ?, ?)",
+        (location, day, name, timestamp)
+    ).rowcount
+    if not inserted:
+        return False
+    conn.execute(
+        "INSERT INTO visit_daily (location, day, visits, guests) VALUES (?, ?, 1, 1) "
+        "ON CONFLICT(location, day) DO UPDATE SET visits = visits + 1, guests = guests + ?",
+        (location, day, int(new_guest_today))
+    )
+    conn.execute(
+        "INSERT INTO guest_location_visits (location, name, visits, first_visit, last_visit) "
+        "VALUES (?, ?, 1, ?, ?) ON CONFLICT(location, name) DO UPDATE SET visits = visits + 1, "
+        "first_visit = min(first_visit, excluded.first_visit), last_visit = max(last_visit, excluded.last_visit)",
+        (location, name, timestamp, timestamp)
+    )
+    conn.execute(
+        "UPDATE guests SET last_visit = max(COALESCE(last_visit, ''), ?) WHERE name = ?", (timestamp, name)
+    )
+    # /queue?location= filters on these counters, so cached pages are stale now.
+    _mark_changed()
+    return True
+
+
+def record_visit(name, location, timestamp=None):
+    with transaction() as conn:
+        return _append_visit(conn, name, location, timestamp)
+
+
+def _recount(conn, names):
+    # Rebuild the counters touched by a bulk change to the given guests' visits.
+    placeholders = ", ".join("?" * len(names))
+    days = conn.execute(
+        f"SELECT DISTINCT location, day FROM visits WHERE name IN ({placeholders})", names
+    ).fetchall()
+    conn.execute(f"DELETE FROM guest_location_visits WHERE name IN ({placeholders})", names)
+    conn.execute(
+        "INSERT INTO guest_location_visits (location, name, visits, first_visit, last_visit) "
+        f"SELECT location, name, COUNT(*), MIN(timestamp), MAX(timestamp) FROM visits "
+        f"WHERE name IN ({placeholders}) GROUP BY location, name", names
+    )
+    for location, day in days:
+        conn.execute(
+            "INSERT OR REPLACE INTO visit_daily (location, day, visits, guests) "
+            "SELECT location, day, COUNT(*), COUNT(DISTINCT name) FROM visits "
+            "WHERE location = ? AND day = ? GROUP BY location, day",
+            (location, day)
+        )
+
+
+def move_visits(old_name, new_name):
+    # Used when a ghost becomes a real guest, so its history comes along.
+    with transaction() as conn:
+        conn.execute("UPDATE OR IGNORE visits SET name = ? WHERE name = ?", (new_name, old_name))
+        conn.execute("DELETE FROM visits WHERE name = ?", (old_name,))
+        _recount(conn, [old_name, new_name])
+        conn.execute(
+            "UPDATE guests SET last_visit = NULLIF(max(COALESCE(last_visit, ''),"
+            " COALESCE((SELECT MAX(timestamp) FROM visits WHERE name = ?), '')), '') WHERE name = ?",
+            (new_name, new_name)
+        )
+        _mark_changed()
+
+
+def guest_visits(name, limit=None):
+    # Most recent first.
+    sql = "SELECT timestamp, location FROM visits WHERE name = ? ORDER BY timestamp DESC"
+    params = [name]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [
+        {"timestamp": timestamp, "location": location}
+        for timestamp, location in _connect().execute(sql, params)
+    ]
+
+
+def location_report(location, start=None, end=None):
+    # start/end are inclusive YYYY-MM-DD days and bound the daily rows; the
+    # unique/repeat guest counts are all-time. Reads only the precomputed counters.
+    conn = _connect()
+    clauses, params = ["location = ?"], [location]
+    if start:
+        clauses.append("day >= ?")
+        params.append(start)
+    if end:
+        clauses.append("day <= ?")
+        params.append(end)
+    days = [
+        {"day": day, "visits": visits, "guests": guests}
+        for day, visits, guests in conn.execute(
+            f"SELECT day, visits, guests FROM visit_daily WHERE {' AND '.join(clauses)} ORDER BY day",
+            params
+        )
+    ]
+    guests, repeat_guests = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(visits > 1), 0) FROM guest_location_visits WHERE location = ?",
+        (location,)
+    ).fetchone()
+    return {
+        "location": location,
+        "days": days,
+        "visits": sum(day["visits"] for day in days),
+        "unique_guests": guests,
+        "repeat_guests": repeat_guests,
+    }
+
+
+# === Retention ===
+def retention_candidates(max_alias_reviews, max_alias_memory, max_note_segments, tagged_before):
+    # Cheap SQL pre-filter for records that may break a retention rule, so only
+    # those are decoded; the caller trims them exactly. Yields (name, raw JSON).
+    rows = _connect().execute(
+        """
+        SELECT name, data FROM guests WHERE
+            json_array_length(data, '$.alias_reviews') > :max_reviews
+            OR (length(json_extract(data, '$.notes'))
+                - length(replace(json_extract(data, '$.notes'), ' | ', ''))) / 3 >= :max_notes
+            OR EXISTS (SELECT 1 FROM json_each(data, '$.alias_memory') AS memory
+                       WHERE json_array_length(memory.value) > :max_memory)
+            OR EXISTS (SELECT 1 FROM json_each(data, '$.alias_reviews') AS review
+                       WHERE json_extract(review.value, '$.tagged_at') < :tagged_before)
+            OR EXISTS (SELECT 1 FROM json_each(data, '$.alias_memory') AS memory, json_each(memory.value) AS entry
+                       WHERE json_extract(entry.value, '$.tagged_at') < :tagged_before)
+        ORDER BY name
+        """,
+        {
+            "max_reviews": max_alias_reviews,
+            "max_memory": max_alias_memory,
+            "max_notes": max_note_segments,
+            "tagged_before": tagged_before,
+        }
+    )
+    yield from rows
+
+
+def expire_inactive_guests(last_visit_before):
+    # Removes guests whose most recent visit is older than the cutoff. Uses
+    # guests.last_visit, which prune_visits leaves alone; guests that never
+    # visited (e.g. converted ghosts without history) are kept.
+    with transaction() as conn:
+        rows = conn.execute(
+            "SELECT name, length(data) FROM guests WHERE last_visit < ?", (last_visit_before,)
+        ).fetchall()
+        for name, _ in rows:
+            _remove_guest(conn, name)
+    return [name for name, _ in rows], sum(size for _, size in rows)
+
+
+def prune_visits(before_day):
+    # Drops whole days older than before_day from the visit log and its counters.
+    with transaction() as conn:
+        removed, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(location) + length(day) + length(name) + length(timestamp)), 0)"
+            " FROM visits WHERE day < ?", (before_day,)
+        ).fetchone()
+        if not removed:
+            return 0, 0
+        conn.execute("DELETE FROM visits WHERE day < ?", (before_day,))
+        conn.execute("DELETE FROM visit_daily WHERE day < ?", (before_day,))
+        conn.execute(
+            "DELETE FROM guest_location_visits WHERE last_visit < ?", (before_day,)
+        )
+        conn.execute(
+            "UPDATE guest_location_visits SET"
+            " visits = (SELECT COUNT(*) FROM visits"
+            "           WHERE visits.location = guest_location_visits.location AND visits.name = guest_location_visits.name),"
+            " first_visit = (SELECT MIN(timestamp) FROM visits"
+            "                WHERE visits.location = guest_location_visits.location AND visits.name = guest_location_visits.name)"
+            " WHERE first_visit < ?", (before_day,)
+        )
+        _mark_changed()
+    return removed, size
+
+
+# === Change feed ===
+def _log_event(conn, event, name, detail=None):
+    conn.execute(
+        "INSERT INTO guest_events (event, name, detail, created_at) VALUES (?, ?, ?, ?)",
+        (event, name, json.dumps(detail) if detail else None, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+
+
+def events_since(after, limit=500):
+    # Events with seq > after, oldest first. Writers hold the write lock from
+    # BEGIN IMMEDIATE to COMMIT, so seqs become visible in order and a reader
+    # that has seen seq N never gets a smaller one later.
+    rows = _connect().execute(
+        "SELECT seq, event, name, detail, created_at FROM guest_events WHERE seq > ? ORDER BY seq LIMIT ?",
+        (after, limit)
+    )
+    return [
+        dict(json.loads(detail) if detail else {}, seq=seq, event=event, name=name, at=created_at)
+        for seq, event, name, detail, created_at in rows
+    ]
+
+
+def event_range():
+    # (oldest kept seq, newest seq); (0, 0) before the first event.
+    first, last = _connect().execute("SELECT MIN(seq), MAX(seq) FROM guest_events").fetchone()
+    return first or 0, last or 0
+
+
+def prune_events(keep):
+    with transaction() as conn:
+        return conn.execute(
+            "DELETE FROM guest_events WHERE seq <= (SELECT MAX(seq) FROM guest_events) - ?", (keep,)
+        ).rowcount
+
+
+# === Whole-DB access (legacy load_guest_db/save_guest_db) ===
+# The returned dict is a fresh copy, but the records inside are shared with the
+# cache: treat them as read-only and write changes back through upsert_guest.
+def load_all():
+    version = data_version()
+    with _cache_lock:
+        if _cache["version"] == version:
+            _cache_stats["hits"] += 1
+            return dict(_cache["guests"])
+        _cache_stats["misses"] += 1
+    with metrics.timed("db_load"):
+        guests = dict(iter_guests())
+    with _cache_lock:
+        _cache["version"] = version
+        _cache["guests"] = guests
+    return dict(guests)
+
+
+def cache_stats():
+    with _cache_lock:
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "version": _cache["version"],
+        }
+
+
+@metrics.instrument("db_save")
+def replace_all(db):
+    with transaction() as conn:
+        existing = dict(conn.execute("SELECT name, data FROM guests"))
+        for name, data in db.items():
+            encoded = json.dumps(data)
+            if existing.pop(name, None) != encoded:
+                _write_guest(conn, name, data, encoded)
+        for name in existing:
+            _remove_guest(conn, name)
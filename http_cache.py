@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config import HTTP_BODY_CACHE_ENTRIES, HTTP_COMPRESS_MIN_BYTES, HTTP_GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Response bodies for guest-data reads, keyed by request path + query and
+# tagged with the guest_store data version they were built from. A body is
+# serialized and compressed once per version; later polls reuse the bytes or,
+# with a matching If-None-Match, get a 304 without touching them at all.
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+_lock = threading.Lock()
+_bodies = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def etag_for(version, key):
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return f"v{version}-{digest}"
+
+
+def _tokens(if_none_match):
+    for token in (if_none_match or "").split(","):
+        token = token.strip()
+        if token.startswith("W/"):
+            token = token[2:]
+        yield token.strip('"')
+
+
+def matched_encoding(if_none_match, etag):
+    # Encoded variants carry a suffix ("...-gzip") but hold the same data;
+    # returns the encoding of the variant the client has, if any matches.
+    for token in _tokens(if_none_match):
+        if token == etag:
+            return "identity"
+        if token.startswith(etag + "-") and token[len(etag) + 1:] in ENCODINGS:
+            return token[len(etag) + 1:]
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    return "*" in _tokens(if_none_match) or matched_encoding(if_none_match, etag) is not None
+
+
+def choose_encoding(accept_encoding):
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=HTTP_GZIP_LEVEL, mtime=0)
+    return body
+
+
+def note_not_modified():
+    with _lock:
+        _stats["not_modified"] += 1
+
+
+def served_encoding(key, version, encoding):
+    # The encoding get_body would answer with, or None when not cached.
+    with _lock:
+        entry = _bodies.get(key)
+        if entry is None or entry["version"] != version:
+            return None
+        if len(entry["variants"]["identity"]) < HTTP_COMPRESS_MIN_BYTES:
+            return "identity"
+        return encoding
+
+
+def get_body(key, version, encoding):
+    # Returns (body, encoding actually used) or None when not cached.
+    with _lock:
+        entry = _bodies.get(key)
+        if entry is None or entry["version"] != version:
+            _stats["misses"] += 1
+            return None
+        _bodies.move_to_end(key)
+        _stats["hits"] += 1
+        variants = entry["variants"]
+        if encoding not in variants:
+            if len(variants["identity"]) < HTTP_COMPRESS_MIN_BYTES:
+                return variants["identity"], "identity"
+            identity = variants["identity"]
+        else:
+            return variants[encoding], encoding
+    body = _compress(identity, encoding)
+    with _lock:
+        if key in _bodies and _bodies[key]["version"] == version:
+            _bodies[key]["variants"][encoding] = body
+    return body, encoding
+
+
+def put_body(key, version, body, encoding):
+    # Caches the serialized body and returns the variant for this request.
+    variants = {"identity": body}
+    if encoding != "identity" and len(body) >= HTTP_COMPRESS_MIN_BYTES:
+        variants[encoding] = _compress(body, encoding)
+    else:
+        encoding = "identity"
+    with _lock:
+        _bodies[key] = {"version": version, "variants": variants}
+        _bodies.move_to_end(key)
+        while len(_bodies) > HTTP_BODY_CACHE_ENTRIES:
+            _bodies.popitem(last=False)
+    return variants[encoding], encoding
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_bodies), encodings=list(ENCODINGS))
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from api_usage_tracker import DailyQuotaExceeded
+from config import (
+    JOB_STORE_FILE, JOB_MAX_WORKERS, JOB_MAX_PENDING, JOB_TIMEOUT_SECONDS, JOB_KIND_TIMEOUT_SECONDS,
+    JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF_SECONDS
+)
+
+# Jobs run on this process's thread pool; their status lives in SQLite so any
+# web worker can answer /jobs/<id>, not just the one that accepted the job.
+
+HANDLERS = {}
+# Called with the job's arguments once it is over, whatever the outcome.
+CLEANUPS = {}
+
+# Retrying these gives the same answer: bad input, unknown guests, a spent quota.
+PERMANENT_ERRORS = (ValueError, TypeError, LookupError, DailyQuotaExceeded)
+
+_local = threading.local()
+_executor = ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix="job")
+_pending_lock = threading.Lock()
+_pending = 0
+_recovered = []
+# Marks this process's rows; the pid alone can be reused after a restart.
+_owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    def __init__(self, message, thread):
+        super().__init__(message)
+        self.thread = thread
+
+
+def register_handler(kind, handler, cleanup=None):
+    HANDLERS[kind] = handler
+    if cleanup is not None:
+        CLEANUPS[kind] = cleanup
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(JOB_STORE_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT,"
+            " created_at TEXT NOT NULL, finished_at TEXT, owner TEXT)"
+        )
+        if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        _local.conn = conn
+        with _pending_lock:
+            if not _recovered:
+                _recovered.append(True)
+                _fail_orphaned(conn)
+    return conn
+
+
+def _alive(owner):
+    if owner is None:
+        return False
+    pid = int(owner.split(":")[0])
+    if pid == os.getpid():
+        return owner == _owner
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fail_orphaned(conn):
+    # Jobs are only run by the process that accepted them, so queued or
+    # running rows whose process is gone would otherwise stay that way forever.
+    rows = conn.execute("SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    for job_id, owner in rows:
+        if not _alive(owner):
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker exited before the job finished',"
+                " finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (_now(), job_id)
+            )
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _update(job_id, **fields):
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    _connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def submit_job(kind, *args):
+    global _pending
+    if kind not in HANDLERS:
+        raise KeyError(f"No job handler registered for {kind!r}")
+    with _pending_lock:
+        if _pending >= JOB_MAX_PENDING:
+            raise QueueFull(f"{_pending} jobs already waiting")
+        _pending += 1
+    job_id = uuid.uuid4().hex
+    _connect().execute(
+        "INSERT INTO jobs (id, kind, status, created_at, owner) VALUES (?, ?, 'queued', ?, ?)",
+        (job_id, kind, _now(), _owner)
+    )
+    _executor.submit(_run, job_id, kind, args)
+    return job_id
+
+
+def _call_with_timeout(handler, args, timeout):
+    # Threads can't be killed, so a timed-out attempt is abandoned, not stopped;
+    # that is why _run never retries after a timeout and waits for it to end.
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = handler(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise JobTimeout(f"timed out after {timeout:g}s", thread)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+
+def _run(job_id, kind, args):
+    global _pending
+    try:
+        for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+            _update(job_id, status="running", attempts=attempt)
+            try:
+                result = _call_with_timeout(
+                    HANDLERS[kind], args, JOB_KIND_TIMEOUT_SECONDS.get(kind, JOB_TIMEOUT_SECONDS)
+                )
+            except JobTimeout as e:
+                # The attempt may still be running; a retry would run the handler twice.
+                _update(job_id, status="timed_out", error=str(e), finished_at=_now())
+                # Keep this pool thread and the pending slot until the handler
+                # really stops, so stuck handlers can't pile up unbounded.
+                e.thread.join()
+                return
+            except Exception as e:
+                if attempt == JOB_MAX_ATTEMPTS or isinstance(e, PERMANENT_ERRORS):
+                    _update(job_id, status="failed", error=str(e), finished_at=_now())
+                    return
+                time.sleep(JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            else:
+                _update(job_id, status="done", result=json.dumps(result), finished_at=_now())
+                return
+    finally:
+        if kind in CLEANUPS:
+            try:
+                CLEANUPS[kind](*args)
+            except Exception as e:
+                print(f"❌ Cleanup for {kind} job {job_id} failed: {e}")
+        with _pending_lock:
+            _pending -= 1
+
+
+def get_job(job_id):
+    row = _connect().execute(
+        "SELECT id, kind, status, attempts, result, error, created_at, finished_at"
+        " FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(("id", "kind", "status", "attempts", "result", "error", "created_at", "finished_at"), row))
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
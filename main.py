@@ -1,119 +1,42 @@
-import time
 import json
 import os
-import re
-from datetime import datetime
-from PIL import Image
-import pytesseract
-from search_utils import run_full_guest_search
 from review_matcher import analyze_review_text
-from star_rating import get_star_rating, update_star_rating
-from guest_notes import get_shared_notes, add_guest_note
-from stylometry import compare_writing_style
-from api_usage_tracker import check_api_quota
-
-SHARED_FILE = "shared_contributions.json"
-GUEST_DB_FILE = "guest_db.json"
-
-# === Registry and Shared Notes ===
-def load_registry():
-    with open("restaurant_registry.json", "r") as f:
-        return json.load(f)
-
-def choose_restaurant_id():
-    registry = load_registry()
-    print("\nSelect your restaurant location:")
-    for idx, (rid, name) in enumerate(registry.items(), 1):
-        print(f"{idx}. {rid} — {name}")
-    try:
-        choice = int(input("Enter choice number: "))
-        selected_id = list(registry.keys())[choice - 1]
-        return selected_id
-    except (IndexError, ValueError):
-        print("Invalid choice. Defaulting to first entry.")
-        return list(registry.keys())[0]
-
-def load_shared_contributions():
-    if not os.path.exists(SHARED_FILE):
-        return {}
-    with open(SHARED_FILE, "r") as f:
-        return json.load(f)
-
-def save_shared_contribution(guest_name, note):
-    shared = load_shared_contributions()
-    if guest_name not in shared:
-        shared[guest_name] = []
-    shared[guest_name].append(note)
-    with open(SHARED_FILE, "w") as f:
-        json.dump(shared, f, indent=4)
-
-# === Guest DB ===
-def load_guest_db():
-    if not os.path.exists(GUEST_DB_FILE):
-        return {}
-    with open(GUEST_DB_FILE, "r") as f:
-        return json.load(f)
-
-def save_guest_db(db):
-    with open(GUEST_DB_FILE, "w") as f:
-        json.dump(db, f, indent=4)
+from star_rating import get_risk_color, rescore_all
+from api_usage_tracker import QuotaExceeded
+import guest_store
+import guest_service
+from reservation_parser import parse_reservation_text
+from batch_scan import read_reservations, scan_reservations
+import cold_pool
+import retention
+import shared_sync
+import metrics
+from config import COLD_POOL_PAGE_SIZE, SHARED_SYNC_PEERS
+
+# The OCR stack (Pillow, pytesseract) and the review process pool are imported
+# inside the menu options that use them, so starting the menu stays fast.
 
 def scan_new_guest():
     name = input("Enter guest full name: ")
     email = input("Enter guest email address: ")
     phone = input("Enter guest phone number (optional): ")
     party_size = input("Enter number in guest's party: ")
-
-    check_api_quota()
+    restaurant_id = choose_restaurant_id()
 
     print("\n\U0001F6E1️ Checking public risk mentions...")
-    guest_profile = run_full_guest_search(name, email, phone)
-    risk_score = guest_profile.get("risk_score", 0)
-    style_match = guest_profile.get("style_match", 0)
-    keywords = guest_profile.get("keywords", [])
-    matched_platforms = guest_profile.get("matched_platforms", [])
-
-    if risk_score >= 80:
-        star_rating = 1
-    elif risk_score >= 60:
-        star_rating = 2
-    elif risk_score >= 40:
-        star_rating = 3
-    elif risk_score >= 20:
-        star_rating = 4
-    else:
-        star_rating = 5
-
-    shared_notes = get_shared_notes(name)
-
-    guest_data = {
-        "email": email,
-        "phone": phone,
-        "party_size": party_size,
-        "risk_score": risk_score,
-        "style_match": style_match,
-        "keywords": keywords,
-        "star_rating": star_rating,
-        "notes": shared_notes,
-        "matched_platforms": matched_platforms,
-        "alias_reviews": [],
-        "visit_history": [{
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "location": choose_restaurant_id()
-        }]
-    }
-
-    db = load_guest_db()
-    db[name] = guest_data
-    save_guest_db(db)
+    try:
+        guest_data = guest_service.scan_guest(name, email, phone, party_size, restaurant_id)
+    except QuotaExceeded as e:
+        print(f"❌ {e}. Guest not scanned; try again later.")
+        return
+    risk_score = guest_data["risk_score"]
+    style_match = guest_data["style_match"]
+    keywords = guest_data["keywords"]
+    star_rating = guest_data["star_rating"]
+    matched_platforms = guest_data["matched_platforms"]
+    shared_notes = guest_data["notes"]
 
-    risk_color = ""
-    if risk_score >= 80:
-        risk_color = "\U0001F534 HIGH"
-    elif risk_score >= 40:
-        risk_color = "\U0001F7E1 MEDIUM"
-    elif risk_score > 0:
-        risk_color = "\U0001F7E2 LOW"
+    risk_color = get_risk_color(risk_score)
 
     print("\n✅ Guest Saved:")
     print(f"Name: {name}")
@@ -129,126 +52,7 @@ def scan_new_guest():
             print("⚠️ ALERT: Multiple platforms flagged this guest — Possible viral or reputation risk")
     if shared_notes:
         print(f"Shared Notes: {shared_notes}")
-# === Part 2 of 2 ===
-
-def view_guest_queue():
-    db = load_guest_db()
-    if not db:
-        print("\nGuest queue is empty.")
-        return
-    print("\n--- Guest Queue ---")
-    for name, info in db.items():
-        print(f"\n{name} | Risk: {info['risk_score']} | Stars: {info['star_rating']} ⭐")
-        print(f"Notes: {info['notes']}")
-        print(f"Keywords: {info['keywords']}")
-        if info.get("alias_reviews"):
-            print("Alias Reviews:")
-            for entry in info["alias_reviews"]:
-                print(f"- {entry['alias']}: {entry['text']}")
-        if info.get("visit_history"):
-            print("Visit History:")
-            for visit in info["visit_history"]:
-                print(f"  • {visit}")
-
-        if info.get("alias_memory"):
-            print("Alias Memory:")
-            for alias, entries in info["alias_memory"].items():
-                print(f"- {alias}:")
-                for entry in entries:
-                    print(f"    • {entry['source']} — {entry['text']}")
-        if info.get("matched_platforms"):
-            print("Matches:")
-            for match in info["matched_platforms"]:
-                print(f"- {match}")
-
-# Add OCR Upload Feature
-from PIL import Image
-import pytesseract
-
-def upload_screenshot():
-    print("\n\U0001F4C2 Upload a screenshot of the reservation (Resy, etc.)")
-    file_path = input("Enter path to image file (e.g., screenshot.png): ").strip()
-
-    if not os.path.exists(file_path):
-        print("❌ File not found.")
-        return
-
-    try:
-        text = pytesseract.image_to_string(Image.open(file_path))
-        print("\n--- OCR Extracted Text ---")
-        print(text)
-
-        name, email, phone, party_size = "", "", "", ""
-        lines = text.split("\n")
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if not email and "@" in line and "." in line:
-                email = line
-            if not phone and re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line):
-                phone = re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line).group(1)
-            if not party_size and re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()):
-                party_size = re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()).group(2)
-            if not name and any(word in line.lower() for word in ["guest", "name", "resy"]):
-                parts = line.split(":")
-                if len(parts) > 1:
-                    name = parts[-1].strip()
-
-        if not name:
-            name = input("Enter guest name (OCR unclear): ").strip()
-        if not email:
-            email = input("Enter guest email (OCR unclear): ").strip()
-        if not phone:
-            phone = input("Enter guest phone (OCR unclear): ").strip()
-        if not party_size:
-            party_size = input("Enter party size (OCR unclear): ").strip()
-
-        print(f"\U0001F9E0 Scanning extracted guest: {name} — {email}")
-        check_api_quota()
-        guest_profile = run_full_guest_search(name, email, phone)
-
-        risk_score = guest_profile.get("risk_score", 0)
-        style_match = guest_profile.get("style_match", 0)
-        keywords = guest_profile.get("keywords", [])
-        matched_platforms = guest_profile.get("matched_platforms", [])
-        shared_notes = get_shared_notes(name)
-
-        guest_data = {
-            "email": email,
-            "phone": phone,
-            "party_size": party_size,
-            "risk_score": risk_score,
-            "style_match": style_match,
-            "keywords": keywords,
-            "star_rating": get_star_rating(risk_score),
-            "notes": shared_notes,
-            "matched_platforms": matched_platforms,
-            "alias_reviews": [],
-            "visit_history": [{
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "location": choose_restaurant_id()
-            }]
-        }
-
-        db = load_guest_db()
-        db[name] = guest_data
-        save_guest_db(db)
-
-        print("\n✅ OCR Guest Scanned:")
-        print(f"Name: {name}")
-        print(f"Risk Score: {risk_score}")
-        print(f"Phone: {phone}")
-        print(f"Party Size: {party_size}")
-        print(f"Keywords: {keywords}")
-        if matched_platforms:
-            print("Matched Platforms:")
-            for m in matched_platforms:
-                print(f"  - {m}")
 
-    except Exception as e:
-        print(f"❌ OCR failed: {e}")
 def view_guest_queue():
     db = load_guest_db()
     if not db:
@@ -263,10 +67,11 @@ def view_guest_queue():
             print("Alias Reviews:")
             for entry in info["alias_reviews"]:
                 print(f"- {entry['alias']}: {entry['text']}")
-        if info.get("visit_history"):
-            print("Visit History:")
-            for visit in info["visit_history"]:
-                print(f"  • {visit}")
+        visits = guest_store.guest_visits(name, limit=5)
+        if visits:
+            print("Recent Visits:")
+            for visit in visits:
+                print(f"  • {visit['timestamp']} @ {visit['location']}")
 
         if info.get("alias_memory"):
             print("Alias Memory:")
@@ -282,7 +87,8 @@ def view_guest_queue():
 def paste_review():
     print("\nPaste the full bad review text below. Then press Enter and wait for analysis:\n")
     review_text = input(">>> ")
-    result = analyze_review_text(review_text)
+    with metrics.timed("review_analysis"):
+        result = analyze_review_text(review_text)
 
     print("\n--- Analysis Result ---")
     print(f"Tone of Review: {result['tone']}")
@@ -293,43 +99,22 @@ def paste_review():
         print(f"Ghost profile created for alias: {result['alias']} — Stylometry: {result['style_match']}%")
     else:
         print("No identity match found. Recommend monitoring for further patterns.")
+
 def manually_tag_alias():
-    db = load_guest_db()
     alias = input("Enter the alias used in the review (e.g., @FoodieCritic42): ")
     real_name = input("Enter the real guest name this alias belongs to: ")
     review_text = input("Paste the review text (optional): ")
 
-    if real_name not in db:
+    note = f"Alias {alias} linked manually to this guest after confirmed review."
+    try:
+        guest_service.tag_alias(real_name, alias, review_text, "Manual Tag", note)
+    except guest_service.UnknownGuest:
         print("Guest not found in database. Try again after scanning them in.")
         return
-
-    if "alias_reviews" not in db[real_name]:
-        db[real_name]["alias_reviews"] = []
-
-    db[real_name]["alias_reviews"].append({
-        "alias": alias,
-        "text": review_text,
-        "verified": True
-    })
-
-    if "alias_memory" not in db[real_name]:
-        db[real_name]["alias_memory"] = {}
-    if alias not in db[real_name]["alias_memory"]:
-        db[real_name]["alias_memory"][alias] = []
-
-    db[real_name]["alias_memory"][alias].append({
-        "text": review_text,
-        "source": "Manual Tag"
-    })
-
-    note = f"Alias {alias} linked manually to this guest after confirmed review."
-    db[real_name]["notes"] += " | " + note
-    save_guest_db(db)
     print(f"✅ Alias {alias} tagged to {real_name} and saved.")
 
 def convert_ghost_guest():
-    db = load_guest_db()
-    ghost_keys = [key for key in db.keys() if key.startswith("ghost_")]
+    ghost_keys = guest_service.list_ghosts()
 
     if not ghost_keys:
         print("\nNo ghost guests found.")
@@ -351,105 +136,59 @@ def convert_ghost_guest():
     phone = input("Enter phone number: ")
     party_size = input("Enter party size: ")
 
-    ghost_data = db.pop(ghost_key)
-    guest_data = {
-        "email": email,
-        "phone": phone,
-        "party_size": party_size,
-        "risk_score": ghost_data.get("risk_score", 0),
-        "style_match": ghost_data.get("style_match", 0),
-        "keywords": ghost_data.get("keywords", []),
-        "star_rating": ghost_data.get("star_rating", 3),
-        "notes": f"Converted from ghost guest {ghost_key}",
-        "matched_platforms": [],
-        "alias_reviews": [],
-        "last_review": ghost_data.get("last_review", ""),
-        "tone": ghost_data.get("tone", "Unknown")
-    }
-
-    db[real_name] = guest_data
-    save_guest_db(db)
+    try:
+        guest_service.convert_ghost(ghost_key, real_name, email, phone, party_size)
+    except guest_service.UnknownGuest:
+        print(f"Ghost guest {ghost_key} no longer exists.")
+        return
     print(f"✅ Ghost guest {ghost_key} converted to {real_name}.")
 
 def view_cold_match_pool():
-    pool_file = "cold_match_pool.json"
-    if not os.path.exists(pool_file):
-        print("\nNo cold match pool found.")
-        return
-
-    with open(pool_file, "r") as f:
-        reviews = json.load(f)
-
-    if not reviews:
+    # Pages through the pool; tagging or dismissing an entry is one small append.
+    after = 0
+    page, next_cursor = cold_pool.list_entries(after, COLD_POOL_PAGE_SIZE)
+    if not page:
         print("\nCold match pool is empty.")
         return
 
-    db = load_guest_db()
-    updated_reviews = []
-
-    print("\n--- Cold Match Pool ---")
-    for idx, entry in enumerate(reviews, 1):
-        print(f"\n#{idx}")
-        print(f"📝 Review: {entry['text']}")
-        print(f"🟡 Tone: {entry.get('tone', 'Unknown')}")
-        print(f"🔑 Keywords: {', '.join(entry.get('keywords', []))}")
-        tag = input("Tag this review to a guest? (y/n): ").strip().lower()
-        if tag == "y":
-            alias = input("Enter alias used in review (e.g., @KarenSnaps): ").strip()
-            real_name = input("Enter real guest name: ").strip()
-            if real_name not in db:
-                print("Guest not found. Please scan them first (Option 1).")
-                updated_reviews.append(entry)
-                continue
-            if "alias_reviews" not in db[real_name]:
-                db[real_name]["alias_reviews"] = []
-            db[real_name]["alias_reviews"].append({
-                "alias": alias,
-                "text": entry["text"],
-                "verified": True
-            })
-
-            if "alias_memory" not in db[real_name]:
-                db[real_name]["alias_memory"] = {}
-            if alias not in db[real_name]["alias_memory"]:
-                db[real_name]["alias_memory"][alias] = []
-            db[real_name]["alias_memory"][alias].append({
-                "text": entry["text"],
-                "source": "Cold Pool Tag"
-            })
-            note = f"Alias {alias} linked from Cold Pool to this guest."
-            db[real_name]["notes"] += " | " + note
-            print(f"✅ Tagged and removed from Cold Match Pool.")
-        else:
-            updated_reviews.append(entry)
-
-    save_guest_db(db)
-    with open(pool_file, "w") as f:
-        json.dump(updated_reviews, f, indent=4)
-import time
-import json
-import os
-import re
-from datetime import datetime
-from PIL import Image
-import pytesseract
-from search_utils import run_full_guest_search
-from review_matcher import analyze_review_text
-from star_rating import get_star_rating, update_star_rating
-from guest_notes import get_shared_notes, add_guest_note
-from stylometry import compare_writing_style
-from api_usage_tracker import check_api_quota
-
-SHARED_FILE = "shared_contributions.json"
-GUEST_DB_FILE = "guest_db.json"
-
+    print(f"\n--- Cold Match Pool ({cold_pool.pool_size()} reviews) ---")
+    while page:
+        for entry in page:
+            print(f"\n#{entry['id']}")
+            print(f"📝 Review: {entry['text']}")
+            print(f"🟡 Tone: {entry.get('tone', 'Unknown')}")
+            print(f"🔑 Keywords: {', '.join(entry.get('keywords', []))}")
+            tag = input("Tag this review to a guest? (y/n/d=dismiss/q=quit): ").strip().lower()
+            if tag == "q":
+                return
+            if tag == "d":
+                cold_pool.remove_entry(entry["id"])
+                print("🗑️ Dismissed from Cold Match Pool.")
+            elif tag == "y":
+                alias = input("Enter alias used in review (e.g., @KarenSnaps): ").strip()
+                real_name = input("Enter real guest name: ").strip()
+                note = f"Alias {alias} linked from Cold Pool to this guest."
+                try:
+                    guest_service.tag_alias(real_name, alias, entry["text"], "Cold Pool Tag", note)
+                except guest_service.UnknownGuest:
+                    print("Guest not found. Please scan them first (Option 1).")
+                    continue
+                cold_pool.remove_entry(entry["id"])
+                print(f"✅ Tagged and removed from Cold Match Pool.")
+        if next_cursor is None:
+            break
+        if input("\nShow next page? (y/n): ").strip().lower() != "y":
+            break
+        page, next_cursor = cold_pool.list_entries(next_cursor, COLD_POOL_PAGE_SIZE)
 # === Registry and Shared Notes ===
 def load_registry():
-    with open("restaurant_registry.json", "r") as f:
-        return json.load(f)
+    return guest_service.get_registry()
 
 def choose_restaurant_id():
     registry = load_registry()
+    if not registry:
+        print("\nNo restaurant registry found; visit will be saved without a location.")
+        return ""
     print("\nSelect your restaurant location:")
     for idx, (rid, name) in enumerate(registry.items(), 1):
         print(f"{idx}. {rid} — {name}")
@@ -461,33 +200,48 @@ def choose_restaurant_id():
         print("Invalid choice. Defaulting to first entry.")
         return list(registry.keys())[0]
 
-def load_shared_contributions():
-    if not os.path.exists(SHARED_FILE):
-        return {}
-    with open(SHARED_FILE, "r") as f:
-        return json.load(f)
-
 def save_shared_contribution(guest_name, note):
-    shared = load_shared_contributions()
-    if guest_name not in shared:
-        shared[guest_name] = []
-    shared[guest_name].append(note)
-    with open(SHARED_FILE, "w") as f:
-        json.dump(shared, f, indent=4)
+    # Appends to this location's shared changelog; other sites pull it on sync.
+    return shared_sync.add_note(guest_name, note)
+
+def submit_shared_guest_note():
+    guest_name = input("Enter guest name: ").strip()
+    note = input("Enter note to share with other locations: ").strip()
+    if not guest_name or not note:
+        print("Guest name and note are both required.")
+        return
+    save_shared_contribution(guest_name, note)
+    print(f"✅ Shared note saved for {guest_name}.")
+
+def sync_shared_notes():
+    if not SHARED_SYNC_PEERS:
+        print("No sync peers configured (set CONTROLL_SYNC_PEERS).")
+        return
+    print("\n\U0001F504 Syncing shared notes with other locations...")
+    try:
+        results = shared_sync.sync_peers()
+    except shared_sync.LocationNotConfigured as e:
+        print(f"❌ {e}.")
+        return
+    for peer, result in results.items():
+        if "error" in result:
+            print(f"❌ {peer}: {result['error']}")
+        else:
+            print(f"✅ {peer}: pushed {result['pushed']}, pulled {result['pulled']}")
 
 # === Guest DB ===
+# Backed by guest_store (SQLite); prefer guest_store.get_guest/upsert_guest
+# when only one record changes.
 def load_guest_db():
-    if not os.path.exists(GUEST_DB_FILE):
-        return {}
-    with open(GUEST_DB_FILE, "r") as f:
-        return json.load(f)
+    return guest_store.load_all()
 
 def save_guest_db(db):
-    with open(GUEST_DB_FILE, "w") as f:
-        json.dump(db, f, indent=4)
+    guest_store.replace_all(db)
 
 # === OCR Upload Feature ===
 def upload_screenshot():
+    from ocr_utils import ocr_image
+
     print("\n\U0001F4C2 Upload a screenshot of the reservation (Resy, etc.)")
     file_path = input("Enter path to image file (e.g., screenshot.png): ").strip()
 
@@ -496,27 +250,14 @@ def upload_screenshot():
         return
 
     try:
-        text = pytesseract.image_to_string(Image.open(file_path))
+        text = ocr_image(file_path)
         print("\n--- OCR Extracted Text ---")
         print(text)
 
-        name, email, phone, party_size = "", "", "", ""
-        lines = text.split("\n")
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if not email and "@" in line and "." in line:
-                email = line
-            if not phone and re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line):
-                phone = re.search(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})", line).group(1)
-            if not party_size and re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()):
-                party_size = re.search(r"(party of|table for|guests?)\s+(\d+)", line.lower()).group(2)
-            if not name and any(word in line.lower() for word in ["guest", "name", "resy"]):
-                parts = line.split(":")
-                if len(parts) > 1:
-                    name = parts[-1].strip()
+        fields = parse_reservation_text(text)
+        name, email, phone, party_size = (
+            fields["name"], fields["email"], fields["phone"], fields["party_size"]
+        )
 
         if not name:
             name = input("Enter guest name (OCR unclear): ").strip()
@@ -527,36 +268,12 @@ def upload_screenshot():
         if not party_size:
             party_size = input("Enter party size (OCR unclear): ").strip()
 
+        restaurant_id = choose_restaurant_id()
         print(f"\U0001F9E0 Scanning extracted guest: {name} — {email}")
-        check_api_quota()
-        guest_profile = run_full_guest_search(name, email, phone)
-
-        risk_score = guest_profile.get("risk_score", 0)
-        style_match = guest_profile.get("style_match", 0)
-        keywords = guest_profile.get("keywords", [])
-        matched_platforms = guest_profile.get("matched_platforms", [])
-        shared_notes = get_shared_notes(name)
-
-        guest_data = {
-            "email": email,
-            "phone": phone,
-            "party_size": party_size,
-            "risk_score": risk_score,
-            "style_match": style_match,
-            "keywords": keywords,
-            "star_rating": get_star_rating(risk_score),
-            "notes": shared_notes,
-            "matched_platforms": matched_platforms,
-            "alias_reviews": [],
-            "visit_history": [{
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "location": choose_restaurant_id()
-            }]
-        }
-
-        db = load_guest_db()
-        db[name] = guest_data
-        save_guest_db(db)
+        guest_data = guest_service.scan_guest(name, email, phone, party_size, restaurant_id)
+        risk_score = guest_data["risk_score"]
+        keywords = guest_data["keywords"]
+        matched_platforms = guest_data["matched_platforms"]
 
         print("\n✅ OCR Guest Scanned:")
         print(f"Name: {name}")
@@ -572,6 +289,120 @@ def upload_screenshot():
     except Exception as e:
         print(f"❌ OCR failed: {e}")
 
+def batch_ocr_directory():
+    from ocr_utils import ocr_batch, iter_image_files
+
+    print("\n\U0001F4C2 Batch OCR a folder of reservation screenshots (Resy, OpenTable exports)")
+    directory = input("Enter folder path: ").strip()
+    if not os.path.isdir(directory):
+        print("❌ Folder not found.")
+        return
+    output_path = input("Write results to (default ocr_results.jsonl): ").strip() or "ocr_results.jsonl"
+
+    ok, failed = 0, 0
+    with open(output_path, "w") as out:
+        for result in ocr_batch(iter_image_files(directory)):
+            if "text" in result:
+                result["fields"] = parse_reservation_text(result["text"])
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+                print(f"❌ {result['file']}: {result['error']}")
+            else:
+                ok += 1
+                fields = result["fields"]
+                print(f"✅ {result['file']}: {fields['name'] or '?'} — party of {fields['party_size'] or '?'} ({fields['platform']})")
+    print(f"\nBatch OCR finished: {ok} succeeded, {failed} failed. Results in {output_path}")
+
+def bulk_scan_reservations():
+    print("\n\U0001F4CB Bulk scan a reservation export (CSV or JSONL)")
+    file_path = input("Enter path to export file: ").strip()
+    if not os.path.exists(file_path):
+        print("❌ File not found.")
+        return
+    fmt = "jsonl" if file_path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    location = choose_restaurant_id()
+
+    with open(file_path, "r", newline="") as f:
+        text = f.read()
+    try:
+        result = scan_reservations(read_reservations(text, fmt), location)
+    except ValueError as e:
+        print(f"❌ Could not read export: {e}")
+        return
+
+    print("\n--- Bulk Scan Summary ---")
+    for entry in result["guests"]:
+        if entry["status"] == "scanned":
+            print(f"✅ {entry['name']} | Risk: {entry['risk_score']} | Stars: {entry['star_rating']} ⭐")
+        else:
+            print(f"❌ {entry['name']}: {entry['error']}")
+    print(f"\n{result['scanned']} guests scanned, {result['failed']} failed.")
+
+def batch_analyze_reviews():
+    from review_batch import run_review_batch
+
+    print("\n\U0001F4DD Batch analyze a review export (Yelp / Google JSONL)")
+    file_path = input("Enter path to review file: ").strip()
+    if not os.path.exists(file_path):
+        print("❌ File not found.")
+        return
+    output_path = input("Write results to (default review_results.jsonl): ").strip() or "review_results.jsonl"
+
+    with open(file_path, "r") as f, open(output_path, "w") as out:
+        stats = run_review_batch(f, out)
+
+    print(f"\n✅ {stats['analyzed']} reviews analyzed, {stats['failed']} unreadable. Results in {output_path}")
+    if stats["negative"]:
+        print(f"🧊 {stats['negative']} negative reviews added to the Cold Match Pool.")
+
+def rescore_star_ratings():
+    print("\n⭐ Re-scoring stored guests with the current star thresholds...")
+    try:
+        result = rescore_all()
+    except ImportError:
+        print("❌ NumPy is required for re-scoring (pip install numpy).")
+        return
+    print(f"✅ {result['changed']} of {result['guests']} guests changed rating.")
+
+def run_retention():
+    print("\n\U0001F9F9 Applying retention rules to stored guests and visits...")
+    report = retention.run_retention()
+    print(f"✅ Trimmed {report['guests_trimmed']} guests, expired {report['guests_expired']}, "
+          f"pruned {report['visits_pruned']} visits and {report['events_pruned']} feed events.")
+    print(f"   Reclaimed about {report['bytes_reclaimed']} bytes.")
+
+def find_guest():
+    print("\n\U0001F50D Find guests by email, phone or review keyword")
+    email = input("Email (optional): ").strip() or None
+    phone = input("Phone (optional): ").strip() or None
+    keyword = input("Keyword (optional): ").strip() or None
+    if not (email or phone or keyword):
+        print("❌ Enter at least one of email, phone or keyword.")
+        return
+
+    matches = guest_store.find_guests(email=email, phone=phone, keyword=keyword)
+    if not matches:
+        print("No matching guests.")
+        return
+    for name, info in matches:
+        print(f"\n{name} — {info.get('email', '')} {info.get('phone', '')}")
+        print(f"   Risk Score: {info.get('risk_score', 0)}  Stars: {info.get('star_rating', '')}")
+        print(f"   Keywords: {', '.join(info.get('keywords', []))}")
+
+def location_visit_report():
+    restaurant_id = choose_restaurant_id()
+    start = input("From day (YYYY-MM-DD, optional): ").strip() or None
+    end = input("To day (YYYY-MM-DD, optional): ").strip() or None
+    report = guest_store.location_report(restaurant_id, start, end)
+
+    print(f"\n--- Visits @ {restaurant_id or 'unknown location'} ---")
+    for day in report["days"]:
+        print(f"{day['day']}: {day['visits']} visits, {day['guests']} guests")
+    print(f"Total visits: {report['visits']}")
+    print(f"Unique guests: {report['unique_guests']} (repeat: {report['repeat_guests']})")
+
 def show_dev_roadmap():
     print("\n" + "="*50)
     print("     ConTROLL DEV ROADMAP — NEXT OBJECTIVES")
@@ -612,8 +443,16 @@ def main():
         print("7. Submit Shared Guest Note")
         print("8. Exit")
         print("9. Upload Screenshot (OCR)")
-
-        choice = input("Enter choice (1/2/3/4/5/6/7/8/9): ")
+        print("10. Batch OCR Screenshot Folder")
+        print("11. Bulk Scan Reservation Export")
+        print("12. Find Guest by Email / Phone / Keyword")
+        print("13. Location Visit Report")
+        print("14. Batch Analyze Review Export")
+        print("15. Re-score Star Ratings")
+        print("16. Sync Shared Notes")
+        print("17. Run Retention Compaction")
+
+        choice = input("Enter choice (1-17): ")
         if choice == "1":
             scan_new_guest()
         elif choice == "2":
@@ -630,6 +469,22 @@ def main():
             submit_shared_guest_note()
         elif choice == "9":
             upload_screenshot()
+        elif choice == "10":
+            batch_ocr_directory()
+        elif choice == "11":
+            bulk_scan_reservations()
+        elif choice == "12":
+            find_guest()
+        elif choice == "13":
+            location_visit_report()
+        elif choice == "14":
+            batch_analyze_reviews()
+        elif choice == "15":
+            rescore_star_ratings()
+        elif choice == "16":
+            sync_shared_notes()
+        elif choice == "17":
+            run_retention()
         elif choice == "8":
             print("Exiting ConTROLL. Goodbye.")
             break
@@ -0,0 +1,192 @@
+import atexit
+import bisect
+import csv
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import file_store
+from config import (
+    METRICS_ENABLED, METRICS_BUCKETS, METRICS_CSV_ENABLED, METRICS_CSV_FILE, METRICS_CSV_BATCH
+)
+
+# Per-stage latency histograms and counters, kept in process memory and
+# rendered in the Prometheus text format. Each process (CLI, every web worker)
+# reports its own numbers.
+
+CSV_HEADER = ["timestamp", "stage", "seconds", "status"]
+
+_lock = threading.Lock()
+_histograms = {}
+_errors = {}
+_counters = {}
+_csv_rows = []
+_NOOP = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start, ok=exc_type is None)
+        return False
+
+
+def timed(stage):
+    # with metrics.timed("ocr"): ...
+    return _Timer(stage) if METRICS_ENABLED else _NOOP
+
+
+def instrument(stage):
+    # Decorator form; returns the function untouched when metrics are off.
+    def wrap(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        def timed_fn(*args, **kwargs):
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+
+        timed_fn.__name__ = fn.__name__
+        timed_fn.__wrapped__ = fn
+        return timed_fn
+
+    return wrap
+
+
+def observe(stage, seconds, ok=True):
+    flush = None
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = {"buckets": [0] * len(METRICS_BUCKETS), "sum": 0.0, "count": 0}
+            _errors[stage] = 0
+        index = bisect.bisect_left(METRICS_BUCKETS, seconds)
+        if index < len(METRICS_BUCKETS):
+            histogram["buckets"][index] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+        if not ok:
+            _errors[stage] += 1
+        if METRICS_CSV_ENABLED:
+            _csv_rows.append([
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"), stage, f"{seconds:.6f}", "ok" if ok else "error"
+            ])
+            if len(_csv_rows) >= METRICS_CSV_BATCH:
+                flush = _csv_rows[:]
+                del _csv_rows[:]
+    if flush:
+        _write_csv(flush)
+
+
+def inc(name, amount=1):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+# === Pool workers ===
+def drain():
+    # Takes this process's numbers and resets them. OCR pool workers return
+    # this with each result so the parent can merge() it into /metrics.
+    with _lock:
+        snapshot = {
+            "histograms": dict(_histograms),
+            "errors": dict(_errors),
+            "counters": dict(_counters),
+            "csv_rows": _csv_rows[:],
+        }
+        _histograms.clear()
+        _errors.clear()
+        _counters.clear()
+        del _csv_rows[:]
+    return snapshot
+
+
+def merge(snapshot):
+    flush = None
+    with _lock:
+        for stage, other in snapshot["histograms"].items():
+            histogram = _histograms.get(stage)
+            if histogram is None:
+                histogram = _histograms[stage] = {"buckets": [0] * len(METRICS_BUCKETS), "sum": 0.0, "count": 0}
+            histogram["buckets"] = [mine + theirs for mine, theirs in zip(histogram["buckets"], other["buckets"])]
+            histogram["sum"] += other["sum"]
+            histogram["count"] += other["count"]
+        for stage, count in snapshot["errors"].items():
+            _errors[stage] = _errors.get(stage, 0) + count
+        for name, amount in snapshot["counters"].items():
+            _counters[name] = _counters.get(name, 0) + amount
+        _csv_rows.extend(snapshot["csv_rows"])
+        if len(_csv_rows) >= METRICS_CSV_BATCH:
+            flush = _csv_rows[:]
+            del _csv_rows[:]
+    if flush:
+        _write_csv(flush)
+
+
+# === crawl_log.csv ===
+def _write_csv(rows):
+    with file_store.file_lock(METRICS_CSV_FILE):
+        new_file = not os.path.exists(METRICS_CSV_FILE) or os.path.getsize(METRICS_CSV_FILE) == 0
+        with open(METRICS_CSV_FILE, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(CSV_HEADER)
+            writer.writerows(rows)
+
+
+def flush_csv():
+    with _lock:
+        rows = _csv_rows[:]
+        del _csv_rows[:]
+    if rows:
+        _write_csv(rows)
+
+
+if METRICS_CSV_ENABLED:
+    atexit.register(flush_csv)
+
+
+# === Prometheus text format ===
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    with _lock:
+        histograms = {stage: dict(h, buckets=h["buckets"][:]) for stage, h in _histograms.items()}
+        errors = dict(_errors)
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP controll_stage_seconds Time spent in each processing stage.",
+        "# TYPE controll_stage_seconds histogram",
+    ]
+    for stage in sorted(histograms):
+        histogram = histograms[stage]
+        cumulative = 0
+        for bound, count in zip(METRICS_BUCKETS, histogram["buckets"]):
+            cumulative += count
+            lines.append(f'controll_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'controll_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'controll_stage_seconds_sum{{stage="{stage}"}} {_format(histogram["sum"])}')
+        lines.append(f'controll_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    lines.append("# HELP controll_stage_errors_total Stage calls that raised.")
+    lines.append("# TYPE controll_stage_errors_total counter")
+    for stage in sorted(errors):
+        lines.append(f'controll_stage_errors_total{{stage="{stage}"}} {errors[stage]}')
+    for name in sorted(counters):
+        lines.append(f"# TYPE controll_{name}_total counter")
+        lines.append(f"controll_{name}_total {counters[name]}")
+    return "\n".join(lines) + "\n"
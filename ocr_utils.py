@@ -0,0 +1,421 @@
+import functools
+import hashlib
+import io
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import file_store
+import metrics
+from config import (
+    OCR_MAX_WORKERS, OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, OCR_PREPROCESS,
+    OCR_UPLOAD_MAX_BYTES, OCR_SPOOL_DIR, OCR_SPOOL_MAX_AGE_SECONDS, OCR_MAX_PAGES, OCR_PDF_DPI
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp")
+READ_CHUNK_BYTES = 64 * 1024
+
+# Pillow and pytesseract are imported where they are used: importing this
+# module (e.g. from web_main) must not pay for the OCR stack until an image
+# actually arrives.
+
+# Running total of the cache directory size in this process (None until first scanned).
+_cache_bytes = None
+
+# One OCR process pool per process, shared by every batch, with at most two
+# images per worker in flight across all of them.
+_pool_lock = threading.Lock()
+_pool = None
+_pool_slots = threading.BoundedSemaphore(OCR_MAX_WORKERS * 2)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedUpload(ValueError):
+    pass
+
+
+# === Upload spooling ===
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _sweep_spool(now):
+    # Spool files start with the pid of the worker that wrote them. Only that
+    # worker uses them (OCR jobs run where they were queued, however long they
+    # wait) and it removes them when done, so a file is left over only once
+    # its worker is gone. Files from before the pid prefix go by age.
+    try:
+        names = os.listdir(OCR_SPOOL_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(OCR_SPOOL_DIR, name)
+        pid = name.partition("-")[0]
+        try:
+            if pid.isdigit():
+                if _process_alive(int(pid)):
+                    continue
+            elif now - os.stat(path).st_mtime <= OCR_SPOOL_MAX_AGE_SECONDS:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def spool_upload(stream, max_bytes=OCR_UPLOAD_MAX_BYTES):
+    # Copies an upload to disk a chunk at a time and returns the spool path,
+    # so a large upload never sits in worker memory.
+    os.makedirs(OCR_SPOOL_DIR, exist_ok=True)
+    _sweep_spool(time.time())
+    fd, path = tempfile.mkstemp(dir=OCR_SPOOL_DIR, prefix=f"{os.getpid()}-", suffix=".upload")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes // (1024 * 1024)} MB")
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def check_upload(path):
+    # Reads only the header: is this an image Pillow knows, or a PDF we can
+    # rasterise? Raises UnsupportedUpload otherwise.
+    if _is_pdf(path):
+        try:
+            import pdf2image  # noqa: F401
+        except ImportError:
+            raise UnsupportedUpload("PDF uploads need pdf2image and poppler (pip install pdf2image)") from None
+        return
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        Image.open(path).close()
+    except UnidentifiedImageError:
+        raise UnsupportedUpload("Upload is not an image or PDF") from None
+
+
+def discard_spool(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# === Preprocessing ===
+def preprocess_image(image, options=OCR_PREPROCESS):
+    from PIL import Image, ImageOps
+
+    if options.get("grayscale"):
+        image = ImageOps.grayscale(image)
+        # Tesseract reads dark text on a light background; flip dark-mode screenshots.
+        histogram = image.histogram()
+        mean = sum(level * count for level, count in enumerate(histogram)) / max(sum(histogram), 1)
+        if mean < 128:
+            image = ImageOps.invert(image)
+
+    scale = 1.0
+    dpi = image.info.get("dpi", (0, 0))[0]
+    if options.get("target_dpi") and dpi and dpi > options["target_dpi"]:
+        scale = options["target_dpi"] / dpi
+    if options.get("max_side"):
+        scale = min(scale, options["max_side"] / max(image.size))
+    if scale < 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+
+    if options.get("crop_to_text") and image.mode == "L":
+        # Anything clearly darker than the background counts as ink.
+        ink = image.point(lambda level: 255 if level < 160 else 0)
+        box = ink.getbbox()
+        if box:
+            margin = options.get("crop_margin", 0)
+            image = image.crop((
+                max(0, box[0] - margin), max(0, box[1] - margin),
+                min(image.width, box[2] + margin), min(image.height, box[3] + margin)
+            ))
+    return image
+
+
+def extract_text(image, options=None):
+    import pytesseract
+
+    if options and options.get("enabled"):
+        image = preprocess_image(image, options)
+    return pytesseract.image_to_string(image)
+
+
+# === Result cache ===
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, key[:2], key + ".txt")
+
+
+def _cache_key(digest, options, page=1):
+    digest = digest.copy()
+    # Different preprocessing gives different text, so it is part of the key.
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    if page > 1:
+        digest.update(f"page {page}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_get(key):
+    path = _cache_path(key)
+    try:
+        with open(path, "r") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # mark as recently used
+    return text
+
+
+def _cache_entries():
+    for root, _, files in os.walk(OCR_CACHE_DIR):
+        for name in files:
+            if name.endswith(".txt"):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+
+def _cache_put(key, text):
+    global _cache_bytes
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_store.atomic_write_text(path, text)
+    if _cache_bytes is None:
+        _cache_bytes = sum(size for _, size, _ in _cache_entries())
+    else:
+        _cache_bytes += len(text.encode("utf-8"))
+    if _cache_bytes > OCR_CACHE_MAX_BYTES:
+        _evict()
+
+
+def _evict():
+    global _cache_bytes
+    entries = sorted(_cache_entries())
+    total = sum(size for _, size, _ in entries)
+    # Trim to 90% so we don't evict again on the very next write.
+    for _, size, path in entries:
+        if total <= OCR_CACHE_MAX_BYTES * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    _cache_bytes = total
+
+
+# === Sources and pages ===
+def _open_source(source):
+    # source is a path, an open binary file, or the raw bytes of an image.
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def _source_digest(source):
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+        return digest
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    finally:
+        if f is source:
+            f.seek(0)
+        else:
+            f.close()
+    return digest
+
+
+def _is_pdf(source):
+    if isinstance(source, bytes):
+        return source.startswith(b"%PDF-")
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(5) == b"%PDF-"
+    head = source.read(5)
+    source.seek(0)
+    return head == b"%PDF-"
+
+
+def _draft(image, options):
+    # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale; ask for the smallest one
+    # that still covers max_side, so the full-size bitmap is never built.
+    max_side = options.get("max_side") if options and options.get("enabled") else None
+    if image.format != "JPEG" or not max_side or max(image.size) <= max_side:
+        return image
+    width, height = image.size
+    scale = max_side / max(width, height)
+    image.draft("L" if options.get("grayscale") else "RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+    if "dpi" in image.info and image.width != width:
+        # Keep the DPI honest so preprocessing doesn't shrink the page twice.
+        ratio = image.width / width
+        image.info["dpi"] = tuple(dpi * ratio for dpi in image.info["dpi"])
+    return image
+
+
+def _pdf_pages(source, max_pages):
+    try:
+        import pdf2image
+    except ImportError as e:
+        raise UnsupportedUpload("PDF uploads need pdf2image and poppler (pip install pdf2image)") from e
+
+    if isinstance(source, (str, os.PathLike)):
+        count = pdf2image.pdfinfo_from_path(source)["Pages"]
+        convert = functools.partial(pdf2image.convert_from_path, source)
+    else:
+        data = source if isinstance(source, bytes) else source.read()
+        count = pdf2image.pdfinfo_from_bytes(data)["Pages"]
+        convert = functools.partial(pdf2image.convert_from_bytes, data)
+    for page in range(1, min(count, max_pages) + 1):
+        yield page, lambda page=page: convert(dpi=OCR_PDF_DPI, first_page=page, last_page=page)[0]
+
+
+def _pages(source, options, max_pages):
+    # Yields (page number, load) pairs; load() decodes just that page and must
+    # be called before moving on to the next one.
+    if _is_pdf(source):
+        yield from _pdf_pages(source, max_pages)
+        return
+
+    from PIL import Image
+
+    with Image.open(_open_source(source)) as image:
+        for index in range(min(getattr(image, "n_frames", 1), max_pages)):
+            def load(index=index):
+                image.seek(index)
+                return _draft(image, options)
+            yield index + 1, load
+
+
+# === OCR entry points ===
+def ocr_pages(source, options=OCR_PREPROCESS, max_pages=OCR_MAX_PAGES):
+    # Yields {"page": n, "text": ...} as each page of a TIFF, PDF or plain image
+    # is read; only one decoded page is held in memory at a time.
+    digest = _source_digest(source)
+    for page, load in _pages(source, options, max_pages):
+        key = _cache_key(digest, options, page)
+        text = _cache_get(key)
+        if text is not None:
+            metrics.inc("ocr_cache_hits")
+        else:
+            with metrics.timed("ocr"):
+                text = extract_text(load(), options)
+            _cache_put(key, text)
+        yield {"page": page, "text": text}
+
+
+def ocr_image(source, options=OCR_PREPROCESS):
+    # source is a path, an open file, or the raw bytes of an image; the pages
+    # of a multi-page file come back as one text separated by blank lines.
+    return "\n\n".join(page["text"] for page in ocr_pages(source, options))
+
+
+def iter_image_files(directory):
+    for entry in sorted(os.listdir(directory)):
+        if entry.lower().endswith(IMAGE_EXTENSIONS):
+            yield entry, os.path.join(directory, entry)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Never fork a web worker: its other threads (jobs, compactor,
+            # change feed) may hold locks the child would then wait on forever.
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["ocr_utils"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS, mp_context=context)
+        return _pool
+
+
+def _submit(source):
+    global _pool
+    from concurrent.futures.process import BrokenProcessPool
+
+    _pool_slots.acquire()
+    try:
+        try:
+            future = _get_pool().submit(_ocr_task, source)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool.
+            with _pool_lock:
+                _pool = None
+            future = _get_pool().submit(_ocr_task, source)
+    except BaseException:
+        _pool_slots.release()
+        raise
+    future.add_done_callback(lambda _: _pool_slots.release())
+    return future
+
+
+def _ocr_task(source):
+    # Runs in a pool process; its timings go back with the result because
+    # the pool process's own metrics never reach /metrics.
+    try:
+        text, error = ocr_image(source), None
+    except Exception as e:
+        text, error = None, str(e)
+    return text, error, metrics.drain()
+
+
+def ocr_batch(sources, max_workers=None):
+    # sources yields (label, source) pairs; results are yielded as each image
+    # finishes, so order follows completion rather than input order.
+    max_in_flight = (max_workers or OCR_MAX_WORKERS) * 2
+    pending = {}
+    for label, source in sources:
+        pending[_submit(source)] = label
+        # Keep only a couple of images per worker in flight to bound memory.
+        if len(pending) >= max_in_flight:
+            yield from _collect(pending)
+    while pending:
+        yield from _collect(pending)
+
+
+def _collect(pending):
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        label = pending.pop(future)
+        try:
+            text, error, snapshot = future.result()
+        except Exception as e:
+            yield {"file": label, "error": str(e)}
+            continue
+        metrics.merge(snapshot)
+        yield {"file": label, "error": error} if error is not None else {"file": label, "text": text}
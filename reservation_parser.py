@@ -0,0 +1,97 @@
+import re
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})")
+PLATFORM_RE = re.compile(r"\b(resy|opentable|open table|tock)\b", re.IGNORECASE)
+
+FIELDS = ("name", "email", "phone", "party_size")
+
+# platform -> {"name": compiled pattern, "party": [compiled patterns]}
+# Every pattern captures the value in group 1.
+TEMPLATES = {}
+
+
+def register_template(platform, name_labels, party_patterns):
+    labels = "|".join(name_labels)
+    TEMPLATES[platform] = {
+        "name": re.compile(
+            rf"^(?:{labels})\b[^:]*?(?::|\s)\s*([^:@]*[A-Za-z][^:@]*?)\s*$", re.IGNORECASE
+        ),
+        "party": [re.compile(pattern, re.IGNORECASE) for pattern in party_patterns],
+    }
+
+
+register_template(
+    "generic",
+    [r".*\bguest", r".*\bname", r".*\bresy"],
+    [r"(?:party of|table for|guests?)\s+(\d+)"],
+)
+register_template(
+    "resy",
+    ["reservation for", "guest name", "guest", "name"],
+    [r"party of\s+(\d+)", r"(\d+)\s+guests?\b", r"guests?\s*:?\s*(\d+)"],
+)
+register_template(
+    "opentable",
+    ["diner name", "diner", "guest name", "name"],
+    [r"party size\s*:?\s*(\d+)", r"table for\s+(\d+)", r"(\d+)\s+(?:people|guests?)\b"],
+)
+register_template(
+    "tock",
+    ["guest name", "booked by", "guest", "name"],
+    [r"party size\s*:?\s*(\d+)", r"(\d+)\s+guests?\b", r"guests?\s*:?\s*(\d+)"],
+)
+
+
+def detect_platform(text):
+    match = PLATFORM_RE.search(text)
+    if not match:
+        return "generic"
+    return match.group(1).lower().replace(" ", "")
+
+
+def parse_reservation_text(text, platform=None):
+    platform = platform or detect_platform(text)
+    template = TEMPLATES.get(platform, TEMPLATES["generic"])
+    name_re = template["name"]
+    party_res = template["party"]
+
+    name, email, phone, party_size = "", "", "", ""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Several fields can share a line ("maria@x.com (415) 555-0142"), so
+        # every field is checked; only the name check skips a line already used.
+        used = False
+        if not email:
+            match = EMAIL_RE.search(line)
+            if match:
+                email = match.group(0)
+                used = True
+        if not phone:
+            match = PHONE_RE.search(line)
+            if match:
+                phone = match.group(1)
+                used = True
+        if not party_size:
+            for party_re in party_res:
+                match = party_re.search(line)
+                if match:
+                    party_size = match.group(1)
+                    used = True
+                    break
+        if not name and not used:
+            match = name_re.match(line)
+            if match:
+                name = match.group(1).strip()
+        if name and email and phone and party_size:
+            break
+
+    return {
+        "platform": platform,
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "party_size": party_size,
+    }
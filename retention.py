@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import guest_store
+from config import RETENTION_RULES, RETENTION_INTERVAL_SECONDS
+
+# Retention rules for data that otherwise only grows: alias lists and the
+# " | "-joined notes inside guest records, the visit log, and guests nobody
+# has seen for months. Only records that break a rule are rewritten.
+
+NOTE_SEPARATOR = " | "
+NO_LIMIT = 2 ** 62
+
+
+def _cutoff(days, now):
+    return (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else ""
+
+
+def _trim_entries(entries, max_entries, cutoff):
+    # Keeps the newest entries; lists are appended to, so newest is last.
+    kept = [entry for entry in entries if not (cutoff and entry.get("tagged_at", cutoff) < cutoff)]
+    if max_entries and len(kept) > max_entries:
+        kept = kept[-max_entries:]
+    return kept
+
+
+def trim_guest(data, rules=RETENTION_RULES, now=None):
+    # Returns a trimmed copy, or None when the record already complies.
+    now = now or datetime.now()
+    cutoff = _cutoff(rules["alias_max_age_days"], now)
+    trimmed = dict(data)
+
+    if isinstance(data.get("alias_reviews"), list):
+        trimmed["alias_reviews"] = _trim_entries(data["alias_reviews"], rules["max_alias_reviews"], cutoff)
+
+    if isinstance(data.get("alias_memory"), dict):
+        memory = {}
+        for alias, entries in data["alias_memory"].items():
+            entries = _trim_entries(entries, rules["max_alias_memory_per_alias"], cutoff)
+            if entries:
+                memory[alias] = entries
+        trimmed["alias_memory"] = memory
+
+    notes = data.get("notes")
+    if isinstance(notes, str) and rules["max_note_segments"]:
+        segments = notes.split(NOTE_SEPARATOR)
+        if len(segments) > rules["max_note_segments"]:
+            trimmed["notes"] = NOTE_SEPARATOR.join(segments[-rules["max_note_segments"]:])
+
+    return trimmed if trimmed != data else None
+
+
+def _months_ago(months, now):
+    return (now - timedelta(days=30 * months)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def run_retention(rules=RETENTION_RULES, now=None):
+    now = now or datetime.now()
+    report = {"guests_trimmed": 0, "guests_expired": 0, "visits_pruned": 0, "events_pruned": 0, "bytes_reclaimed": 0}
+
+    if rules["inactive_guest_months"]:
+        expired, size = guest_store.expire_inactive_guests(_months_ago(rules["inactive_guest_months"], now))
+        report["guests_expired"] = len(expired)
+        report["bytes_reclaimed"] += size
+
+    if rules["visit_max_age_days"]:
+        before_day = (now - timedelta(days=rules["visit_max_age_days"])).strftime("%Y-%m-%d")
+        removed, size = guest_store.prune_visits(before_day)
+        report["visits_pruned"] = removed
+        report["bytes_reclaimed"] += size
+
+    candidates = guest_store.retention_candidates(
+        rules["max_alias_reviews"] or NO_LIMIT,
+        rules["max_alias_memory_per_alias"] or NO_LIMIT,
+        rules["max_note_segments"] or NO_LIMIT,
+        _cutoff(rules["alias_max_age_days"], now),
+    )
+    names = [name for name, encoded in candidates if trim_guest(json.loads(encoded), rules, now) is not None]
+    # Re-read inside the write transaction so edits made since the scan are kept.
+    with guest_store.transaction():
+        for name in names:
+            data = guest_store.get_guest(name)
+            trimmed = trim_guest(data, rules, now) if data is not None else None
+            if trimmed is None:
+                continue
+            guest_store.upsert_guest(name, trimmed)
+            report["guests_trimmed"] += 1
+            report["bytes_reclaimed"] += len(json.dumps(data)) - len(json.dumps(trimmed))
+
+    if rules["max_events"]:
+        report["events_pruned"] = guest_store.prune_events(rules["max_events"])
+    return report
+
+
+def start_background_retention(interval=RETENTION_INTERVAL_SECONDS):
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_retention()
+            except Exception as e:
+                print(f"❌ Retention compaction failed: {e}")
+
+    thread = threading.Thread(target=loop, name="retention", daemon=True)
+    thread.start()
+    return thread
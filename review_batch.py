@@ -0,0 +1,118 @@
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cold_pool
+import metrics
+from config import REVIEW_BATCH_WORKERS, REVIEW_BATCH_CHUNK_SIZE
+from review_matcher import analyze_review_text
+
+# Streams an exported review feed (Yelp / Google JSONL dumps) through
+# analyze_review_text on a process pool. Every stage is a generator and only a
+# bounded window of chunks is in flight, so memory does not grow with the file.
+
+# Field spellings seen in the Yelp and Google review exports.
+FIELD_ALIASES = {
+    "text": ("text", "review", "review_text", "content", "comment", "body"),
+    "alias": ("alias", "author", "author_name", "user", "user_name", "reviewer"),
+    "platform": ("platform", "source", "site"),
+    "review_id": ("review_id", "id"),
+    "date": ("date", "time", "created_at", "published_at"),
+}
+
+
+def _normalize_review(row):
+    review = {}
+    for field, keys in FIELD_ALIASES.items():
+        for key in keys:
+            if row.get(key) not in (None, ""):
+                review[field] = row[key]
+                break
+    return review
+
+
+def read_reviews(lines):
+    # lines is an open file or any iterable of JSONL lines.
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            review = _normalize_review(json.loads(line))
+        except (ValueError, AttributeError):
+            yield {"line": line_number, "error": "invalid JSON"}
+            continue
+        review["line"] = line_number
+        if not review.get("text"):
+            review["error"] = "no review text"
+        yield review
+
+
+def _chunks(reviews, size):
+    chunk = []
+    for review in reviews:
+        chunk.append(review)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _analyze_chunk(texts):
+    return [analyze_review_text(text) for text in texts]
+
+
+def analyze_reviews(reviews, max_workers=None, chunk_size=REVIEW_BATCH_CHUNK_SIZE):
+    # Yields (review, result) in input order; result is None for unusable rows.
+    max_workers = max_workers or REVIEW_BATCH_WORKERS
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = deque()
+        for chunk in _chunks(reviews, chunk_size):
+            texts = [review["text"] for review in chunk if "error" not in review]
+            in_flight.append((chunk, pool.submit(_analyze_chunk, texts)))
+            if len(in_flight) >= max_workers * 2:
+                yield from _finish(*in_flight.popleft())
+        while in_flight:
+            yield from _finish(*in_flight.popleft())
+
+
+def _finish(chunk, future):
+    results = iter(future.result())
+    for review in chunk:
+        yield review, None if "error" in review else next(results)
+
+
+def _cold_pool_entry(review, result):
+    return {
+        "text": review["text"],
+        "tone": result.get("tone", "Unknown"),
+        "risk_score": result.get("risk_score", 0),
+        "keywords": result.get("keywords", []),
+        "alias": review.get("alias") or result.get("alias"),
+        "platform": review.get("platform", ""),
+        "date": review.get("date", ""),
+    }
+
+
+def run_review_batch(lines, out, max_workers=None):
+    # Writes one JSON line per input review to `out` as results arrive. Negative
+    # reviews are spooled to a temp file and added to the cold pool in one append.
+    stats = {"analyzed": 0, "negative": 0, "failed": 0, "cold_pool_id_range": None}
+    with tempfile.TemporaryFile("w+") as spool:
+        for review, result in analyze_reviews(read_reviews(lines), max_workers):
+            if result is None:
+                stats["failed"] += 1
+                out.write(json.dumps({"line": review["line"], "error": review["error"]}) + "\n")
+                continue
+            stats["analyzed"] += 1
+            out.write(json.dumps(dict(result, **review)) + "\n")
+            if result.get("tone") == "Negative":
+                stats["negative"] += 1
+                spool.write(json.dumps(_cold_pool_entry(review, result)) + "\n")
+        spool.seek(0)
+        if stats["negative"]:
+            ids = cold_pool.add_entries(json.loads(line) for line in spool)
+            stats["cold_pool_id_range"] = [ids.start, ids.stop - 1]
+    metrics.inc("reviews_analyzed", stats["analyzed"])
+    return stats
@@ -0,0 +1,94 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+from guest_store import normalize_phone
+from api_usage_tracker import check_api_quota
+from config import SEARCH_CACHE_FILE, SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_MAX_ENTRIES
+from search_utils import run_full_guest_search
+
+# Results of run_full_guest_search keyed on the normalized (name, email, phone).
+# Only misses and forced refreshes go upstream and spend API quota.
+
+STAT_KEYS = ("hits", "misses", "expired", "refreshes", "evictions")
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SEARCH_CACHE_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, result TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_by_last_used ON results (last_used)")
+        conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.executemany("INSERT OR IGNORE INTO stats (key, value) VALUES (?, 0)", [(k,) for k in STAT_KEYS])
+        _local.conn = conn
+    return conn
+
+
+def normalize_key(name, email, phone):
+    name = " ".join((name or "").split()).casefold()
+    email = (email or "").strip().lower()
+    # Same E.164 form the guest index uses; numbers it can't parse keep their digits.
+    phone = normalize_phone(phone) or re.sub(r"\D", "", phone or "")
+    return json.dumps([name, email, phone])
+
+
+def _bump(conn, key, amount=1):
+    conn.execute("UPDATE stats SET value = value + ? WHERE key = ?", (amount, key))
+
+
+def cached_guest_search(name, email, phone, refresh=False, ttl=None):
+    ttl = SEARCH_CACHE_TTL_SECONDS if ttl is None else ttl
+    key = normalize_key(name, email, phone)
+    conn = _connect()
+    now = time.time()
+
+    if not refresh:
+        row = conn.execute("SELECT result, fetched_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row and now - row[1] < ttl:
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            _bump(conn, "hits")
+            return json.loads(row[0])
+        _bump(conn, "expired" if row else "misses")
+    else:
+        _bump(conn, "refreshes")
+
+    check_api_quota()
+    with metrics.timed("guest_search"):
+        result = run_full_guest_search(name, email, phone)
+    conn.execute(
+        "INSERT OR REPLACE INTO results (key, result, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+        (key, json.dumps(result), now, now)
+    )
+    _evict(conn)
+    return result
+
+
+def _evict(conn):
+    count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    excess = count - SEARCH_CACHE_MAX_ENTRIES
+    if excess > 0:
+        conn.execute(
+            "DELETE FROM results WHERE key IN"
+            " (SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        _bump(conn, "evictions", excess)
+
+
+def cache_stats():
+    conn = _connect()
+    stats = dict(conn.execute("SELECT key, value FROM stats"))
+    stats["entries"] = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    lookups = stats["hits"] + stats["misses"] + stats["expired"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
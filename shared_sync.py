@@ -0,0 +1,316 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import file_store
+from config import SHARED_FILE, SHARED_STORE_FILE, SHARED_LOCATION_ID, SHARED_SYNC_PEERS, SHARED_SYNC_BATCH
+
+# Shared guest notes as one append-only changelog per location. Each location
+# numbers its own notes 1, 2, 3...; a copy of another location's log is always
+# a prefix of it, so "what is new" is just seq > the last one we hold, and a
+# sync moves only new notes whatever the size of the history.
+
+BATCH_FILE_RE = re.compile(r"^(\d{10})-(\d{10})\.jsonl$")
+# Changelog for notes written before CONTROLL_LOCATION_ID was set; never synced.
+LOCAL_LOCATION = "local"
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SHARED_STORE_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " location TEXT NOT NULL, seq INTEGER NOT NULL, guest TEXT NOT NULL,"
+            " note TEXT NOT NULL, created_at TEXT NOT NULL,"
+            " PRIMARY KEY (location, seq)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS changes_by_guest ON changes (guest)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _local.conn = conn
+        _import_legacy(conn)
+        _adopt_local_notes(conn)
+    return conn
+
+
+def _location_id():
+    return SHARED_LOCATION_ID or LOCAL_LOCATION
+
+
+def _adopt_local_notes(conn):
+    # Once the site has a location id, notes written before it move into its log.
+    if not SHARED_LOCATION_ID or SHARED_LOCATION_ID == LOCAL_LOCATION:
+        return
+    if conn.execute("SELECT 1 FROM changes WHERE location = ? LIMIT 1", (LOCAL_LOCATION,)).fetchone() is None:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT guest, note, created_at FROM changes WHERE location = ? ORDER BY seq", (LOCAL_LOCATION,)
+        ).fetchall()
+        for guest, note, created_at in rows:
+            _append_local(conn, guest, note, created_at)
+        conn.execute("DELETE FROM changes WHERE location = ?", (LOCAL_LOCATION,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _import_legacy(conn):
+    # shared_contributions.json notes become this location's first entries.
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone() is None:
+            shared = file_store.read_logged(
+                SHARED_FILE, {}, lambda state, record: state.setdefault(record["guest"], []).append(record["note"])
+            )
+            for guest, notes in shared.items():
+                for note in notes:
+                    _append_local(conn, guest, note)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (SHARED_FILE,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _append_local(conn, guest, note, created_at=None):
+    location = _location_id()
+    record = {
+        "location": location,
+        "seq": last_seq(location, conn) + 1,
+        "guest": guest,
+        "note": note,
+        "created_at": created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _insert(conn, [record])
+    return record
+
+
+def _insert(conn, records):
+    conn.executemany(
+        "INSERT OR IGNORE INTO changes (location, seq, guest, note, created_at)"
+        " VALUES (:location, :seq, :guest, :note, :created_at)",
+        records
+    )
+
+
+# === Local changelog ===
+def add_note(guest, note):
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        record = _append_local(conn, guest, note)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return record
+
+
+def notes_for(guest):
+    rows = _connect().execute(
+        "SELECT location, seq, note, created_at FROM changes WHERE guest = ? ORDER BY created_at, location, seq",
+        (guest,)
+    )
+    return [{"location": location, "seq": seq, "note": note, "created_at": created_at}
+            for location, seq, note, created_at in rows]
+
+
+def last_seq(location, conn=None):
+    conn = conn or _connect()
+    row = conn.execute("SELECT MAX(seq) FROM changes WHERE location = ?", (location,)).fetchone()
+    return row[0] or 0
+
+
+def locations():
+    # {location: last seq held here}; what a peer compares against to pull.
+    return dict(_connect().execute(
+        "SELECT location, MAX(seq) FROM changes WHERE location != ? GROUP BY location", (LOCAL_LOCATION,)
+    ))
+
+
+def changes_since(location, since=0, limit=SHARED_SYNC_BATCH):
+    rows = _connect().execute(
+        "SELECT location, seq, guest, note, created_at FROM changes"
+        " WHERE location = ? AND seq > ? ORDER BY seq LIMIT ?",
+        (location, since, limit)
+    )
+    return [dict(zip(("location", "seq", "guest", "note", "created_at"), row)) for row in rows]
+
+
+def merge(records):
+    # Accepts only records that extend a location's log without a gap, so a
+    # partial or out-of-order pull can simply be retried.
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        accepted = 0
+        expected = {}
+        for record in sorted(records, key=lambda r: (r["location"], r["seq"])):
+            location = record["location"]
+            if location not in expected:
+                expected[location] = last_seq(location, conn) + 1
+            if record["seq"] != expected[location]:
+                continue
+            _insert(conn, [record])
+            expected[location] += 1
+            accepted += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return accepted
+
+
+# === Transports ===
+# A transport offers locations() -> {location: last_seq} and
+# changes(location, since, limit) -> [records]. publish(records) is optional:
+# sites reached over HTTP pull from each other's /shared/changes instead.
+class DirectoryTransport:
+    # <path>/<location>/<first seq>-<last seq>.jsonl, one file per published batch.
+
+    def __init__(self, path):
+        self.path = path
+
+    def _batches(self, location):
+        try:
+            names = os.listdir(os.path.join(self.path, location))
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (int(m.group(1)), int(m.group(2)), name)
+            for name in names for m in [BATCH_FILE_RE.match(name)] if m
+        )
+
+    def locations(self):
+        if not os.path.isdir(self.path):
+            return {}
+        result = {}
+        for location in os.listdir(self.path):
+            batches = self._batches(location)
+            if batches:
+                result[location] = batches[-1][1]
+        return result
+
+    def changes(self, location, since=0, limit=SHARED_SYNC_BATCH):
+        records = []
+        for first, last, name in self._batches(location):
+            if last <= since:
+                continue
+            with open(os.path.join(self.path, location, name), "r") as f:
+                records.extend(r for r in map(json.loads, f) if r["seq"] > since)
+            if len(records) >= limit:
+                break
+        return records[:limit]
+
+    def publish(self, records):
+        if not records:
+            return
+        location = records[0]["location"]
+        directory = os.path.join(self.path, location)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{records[0]['seq']:010d}-{records[-1]['seq']:010d}.jsonl"
+        file_store.atomic_write_text(
+            os.path.join(directory, name), "".join(json.dumps(record) + "\n" for record in records)
+        )
+
+
+class HttpTransport:
+    # Another site's web_main: GET /shared/locations and /shared/changes.
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        import urllib.parse
+        import urllib.request
+
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def locations(self):
+        return self._get("/shared/locations")
+
+    def changes(self, location, since=0, limit=SHARED_SYNC_BATCH):
+        return self._get("/shared/changes", location=location, since=since, limit=limit)["changes"]
+
+
+def transport_for(peer):
+    if peer.startswith(("http://", "https://")):
+        return HttpTransport(peer)
+    return DirectoryTransport(peer)
+
+
+# === Sync ===
+def push(transport):
+    # Publishes this location's notes the transport does not have yet.
+    if not hasattr(transport, "publish"):
+        return 0
+    pushed = 0
+    since = transport.locations().get(SHARED_LOCATION_ID, 0)
+    while True:
+        batch = changes_since(SHARED_LOCATION_ID, since)
+        if not batch:
+            return pushed
+        transport.publish(batch)
+        pushed += len(batch)
+        since = batch[-1]["seq"]
+
+
+def pull(transport):
+    pulled = 0
+    for location, remote_seq in transport.locations().items():
+        if location == LOCAL_LOCATION:
+            continue  # another site's unshared notes
+        since = last_seq(location)
+        while since < remote_seq:
+            batch = transport.changes(location, since)
+            if not batch:
+                break
+            accepted = merge(batch)
+            pulled += accepted
+            if not accepted:
+                break
+            since = last_seq(location)
+    return pulled
+
+
+class LocationNotConfigured(ValueError):
+    pass
+
+
+def _require_location_id():
+    # A hostname is not a safe default: two sites sharing one would overwrite
+    # each other's changelog, and containers would get a new one per start.
+    if not SHARED_LOCATION_ID or SHARED_LOCATION_ID == LOCAL_LOCATION:
+        raise LocationNotConfigured("Set CONTROLL_LOCATION_ID to a name unique to this site before syncing")
+
+
+def sync(transport):
+    _require_location_id()
+    return {"pushed": push(transport), "pulled": pull(transport)}
+
+
+def sync_peers(peers=None):
+    _require_location_id()
+    results = {}
+    for peer in SHARED_SYNC_PEERS if peers is None else peers:
+        try:
+            results[peer] = sync(transport_for(peer))
+        except Exception as e:
+            results[peer] = {"error": str(e)}
+    return results
@@ -1,14 +1,39 @@
-def get_star_rating(score):
-    if score >= 80:
-        return 1
-    elif score >= 60:
-        return 2
-    elif score >= 40:
-        return 3
-    elif score >= 20:
-        return 4
-    else:
-        return 5
+import bisect
+
+import guest_store
+from config import STAR_RATING_THRESHOLDS
+
+MAX_STARS = len(STAR_RATING_THRESHOLDS) + 1
+
+
+def get_star_rating(score, thresholds=STAR_RATING_THRESHOLDS):
+    return len(thresholds) + 1 - bisect.bisect_right(thresholds, score or 0)
 
 def update_star_rating(score):
-    return get_star_rating(score)
\ No newline at end of file
+    return get_star_rating(score)
+
+def get_risk_color(score):
+    # Colors follow the star table: 1 star is high risk, 2-3 stars medium.
+    stars = get_star_rating(score)
+    if stars <= 1:
+        return "\U0001F534 HIGH"
+    elif stars <= MAX_STARS - 2:
+        return "\U0001F7E1 MEDIUM"
+    elif score and score > 0:
+        return "\U0001F7E2 LOW"
+    return ""
+
+def rescore_all(thresholds=STAR_RATING_THRESHOLDS):
+    # One vectorized pass over the indexed score columns; only guests whose
+    # rating actually changes are rewritten.
+    import numpy as np
+
+    names, scores, stored = guest_store.star_rating_columns()
+    if not names:
+        return {"guests": 0, "changed": 0}
+    scores = np.array([score or 0 for score in scores], dtype=float)
+    stored = np.array([-1 if stars is None else stars for stars in stored], dtype=int)
+    ratings = len(thresholds) + 1 - np.searchsorted(np.asarray(thresholds, dtype=float), scores, side="right")
+    changed = np.flatnonzero(ratings != stored)
+    guest_store.set_star_ratings({names[i]: int(ratings[i]) for i in changed})
+    return {"guests": len(names), "changed": int(changed.size)}
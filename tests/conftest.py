@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# The modules live at the repo root; point the data dir somewhere disposable
+# before config is imported so nothing touches the real stores.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CONTROLL_DATA_DIR", tempfile.mkdtemp(prefix="controll-tests-"))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # A fresh guest store per test.
+    import guest_store
+
+    monkeypatch.setattr(guest_store, "GUEST_STORE_FILE", str(tmp_path / "guest_db.sqlite3"))
+    monkeypatch.setattr(guest_store, "GUEST_DB_FILE", str(tmp_path / "guest_db.json"))
+    monkeypatch.setattr(guest_store, "_local", threading.local())
+    monkeypatch.setitem(guest_store._cache, "version", None)
+    return tmp_path
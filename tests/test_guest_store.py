@@ -0,0 +1,97 @@
+import json
+import sqlite3
+
+import pytest
+
+import guest_store
+
+ANN = {
+    "email": "Ann@Example.com",
+    "phone": "(415) 555-0142",
+    "risk_score": 40,
+    "star_rating": 3,
+    "keywords": ["refund"],
+    "notes": "",
+    "visit_history": [
+        {"timestamp": "2025-03-01 19:00:00", "location": "r001"},
+        {"timestamp": "2025-03-08 19:30:00", "location": "r001"},
+    ],
+}
+
+
+def _run_migrations(conn, scripts):
+    for script in scripts:
+        if callable(script):
+            script(conn)
+            continue
+        for statement in script.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+
+
+def _build_old_store(path, version):
+    # A store created by the tree that had `version` migrations: the guest was
+    # written with inline visits back at version 1, then upgraded step by step.
+    if version == 0:
+        with open(path / "guest_db.json", "w") as f:
+            json.dump({"Ann": ANN}, f)
+        return
+    conn = sqlite3.connect(str(path / "guest_db.sqlite3"), isolation_level=None)
+    _run_migrations(conn, guest_store.MIGRATIONS[:1])
+    conn.execute("INSERT INTO guests (name, data) VALUES (?, ?)", ("Ann", json.dumps(ANN)))
+    _run_migrations(conn, guest_store.MIGRATIONS[1:version])
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.close()
+
+
+@pytest.mark.parametrize("version", range(len(guest_store.MIGRATIONS)))
+def test_upgrade_from_older_schema(store, version):
+    _build_old_store(store, version)
+
+    conn = guest_store._connect()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(guest_store.MIGRATIONS)
+    ann = guest_store.get_guest("Ann")
+    assert "visit_history" not in ann
+    assert ann["email"] == "Ann@Example.com"
+    assert [name for name, _ in guest_store.find_guests(phone="+14155550142")] == ["Ann"]
+    assert [name for name, _ in guest_store.query_guests(location="r001")] == ["Ann"]
+    assert [visit["timestamp"] for visit in guest_store.guest_visits("Ann")] == [
+        "2025-03-08 19:30:00", "2025-03-01 19:00:00"
+    ]
+    report = guest_store.location_report("r001")
+    assert (report["visits"], report["unique_guests"], report["repeat_guests"]) == (2, 1, 1)
+
+    # The upgraded store takes writes and logs them to the change feed.
+    _, before = guest_store.event_range()
+    guest_store.upsert_guest("Ann", dict(ann, notes="seen again"))
+    assert [(event["event"], event["name"]) for event in guest_store.events_since(before)] == [("updated", "Ann")]
+
+
+def test_visit_writes_bump_data_version(store):
+    guest_store.upsert_guest("Ann", {"notes": ""})
+    version = guest_store.data_version()
+    guest_store.record_visit("Ann", "r001", "2025-03-01 19:00:00")
+    assert guest_store.data_version() > version
+
+    version = guest_store.data_version()
+    guest_store.record_visit("Ann", "r001", "2025-03-01 19:00:00")  # duplicate: no change
+    assert guest_store.data_version() == version
+
+    guest_store.prune_visits("2026-01-01")
+    assert guest_store.data_version() > version
+    assert list(guest_store.query_guests(location="r001")) == []
+
+
+def test_events_are_ordered_and_labelled(store):
+    guest_store.upsert_guest("ghost_1", {"risk_score": 10})
+    guest_store.upsert_guest("Ann", {"risk_score": 50}, event=("alias_tagged", {"alias": "@ann"}))
+    guest_store.delete_guest("ghost_1")
+    events = guest_store.events_since(0)
+    assert [event["seq"] for event in events] == sorted(event["seq"] for event in events)
+    assert [(event["event"], event["name"]) for event in events] == [
+        ("added", "ghost_1"), ("alias_tagged", "Ann"), ("removed", "ghost_1")
+    ]
+    assert events[1]["alias"] == "@ann"
+
+    assert guest_store.prune_events(1) == 2
+    assert guest_store.event_range() == (events[-1]["seq"], events[-1]["seq"])
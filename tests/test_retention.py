@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import guest_store
+import retention
+
+RULES = dict(
+    retention.RETENTION_RULES,
+    visit_max_age_days=90, inactive_guest_months=6, alias_max_age_days=0, max_events=0,
+)
+NOW = datetime(2026, 10, 1)
+
+
+def test_inactive_guests_expire_even_after_their_visits_are_pruned(store):
+    guest_store.upsert_guest("Ann", {"notes": ""})
+    guest_store.record_visit("Ann", "r001", "2026-01-01 19:00:00")
+    guest_store.upsert_guest("Bob", {"notes": ""})
+    guest_store.record_visit("Bob", "r001", "2026-09-20 19:00:00")
+    guest_store.upsert_guest("Ghost Convert", {"notes": ""})  # never visited
+
+    # Visits go first, so nothing in the visit log says Ann ever came.
+    guest_store.prune_visits("2026-07-03")
+    report = retention.run_retention(RULES, now=NOW)
+
+    assert report["guests_expired"] == 1
+    assert guest_store.get_guest("Ann") is None
+    assert guest_store.get_guest("Bob") is not None
+    assert guest_store.get_guest("Ghost Convert") is not None
+
+
+def test_moved_visits_carry_last_visit(store):
+    guest_store.record_visit("ghost_1", "r001", "2026-01-01 19:00:00")
+    guest_store.move_visits("ghost_1", "Ann")
+    guest_store.upsert_guest("Ann", {"notes": ""})
+    guest_store.prune_visits("2026-07-03")
+
+    assert retention.run_retention(RULES, now=NOW)["guests_expired"] == 1
+
+
+def test_trim_keeps_newest_entries(store):
+    reviews = [{"alias": "@a", "text": str(i)} for i in range(60)]
+    guest_store.upsert_guest("Ann", {"notes": " | ".join(map(str, range(30))), "alias_reviews": reviews})
+
+    report = retention.run_retention(RULES, now=NOW)
+    ann = guest_store.get_guest("Ann")
+
+    assert report["guests_trimmed"] == 1 and report["bytes_reclaimed"] > 0
+    assert [review["text"] for review in ann["alias_reviews"]] == [str(i) for i in range(10, 60)]
+    assert ann["notes"].split(" | ") == [str(i) for i in range(10, 30)]
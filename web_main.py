@@ -1,24 +1,127 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+import base64
+import functools
 import os
 import json
-from datetime import datetime
-from PIL import Image
-import pytesseract
-
-from main import (
-    scan_new_guest, upload_screenshot, view_guest_queue,
-    paste_review, manually_tag_alias, convert_ghost_guest,
-    view_cold_match_pool, submit_shared_guest_note,
-    load_guest_db
-)
+import time
+
+# Set persistent disk paths (must happen before config is imported)
+os.environ.setdefault("CONTROLL_DATA_DIR", "/data")
 
-# Set persistent disk paths
-DATA_DIR = "/data"
-GUEST_DB_FILE = os.path.join(DATA_DIR, "guest_db.json")
-SHARED_FILE = os.path.join(DATA_DIR, "shared_contributions.json")
-COLD_MATCH_FILE = os.path.join(DATA_DIR, "cold_match_pool.json")
+import guest_service
+import guest_store
+from guest_store import load_all as load_guest_db
+from ocr_utils import ocr_pages, ocr_batch, spool_upload, check_upload, discard_spool, UploadTooLarge, UnsupportedUpload
+from reservation_parser import parse_reservation_text
+import job_queue
+import search_cache
+import api_usage_tracker
+from batch_scan import read_reservations, normalize_reservations, scan_reservations
+import change_feed
+import cold_pool
+import retention
+import shared_sync
+import star_rating
+import metrics
+import http_cache
+from config import (
+    COLD_POOL_PAGE_SIZE, SHARED_SYNC_BATCH, OCR_UPLOAD_MAX_BYTES, EVENTS_KEEPALIVE_SECONDS, EVENTS_RETRY_MS,
+    EVENTS_STREAM_MAX_SECONDS
+)
 
 app = Flask(__name__)
+# Werkzeug stops reading a body past this, multipart or chunked, before it is
+# spooled anywhere. It bounds every request, /ocr/batch included.
+app.config["MAX_CONTENT_LENGTH"] = OCR_UPLOAD_MAX_BYTES
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Upload is larger than {OCR_UPLOAD_MAX_BYTES // (1024 * 1024)} MB"}), 413
+
+@app.errorhandler(api_usage_tracker.QuotaExceeded)
+def quota_exceeded(e):
+    # Synchronous scans and refreshes call upstream in the request; a daily
+    # quota error's retry_after points at midnight, when the counter resets.
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+def _ocr_page(page):
+    return dict(page, fields=parse_reservation_text(page["text"]))
+
+def _ocr_job(spool_path):
+    # Takes a spooled upload and leaves it for retries; the caller, or the job
+    # queue once the job is over, removes it.
+    try:
+        pages = [_ocr_page(page) for page in ocr_pages(spool_path)]
+    except OSError as e:
+        # Recognised header but unreadable data, e.g. a truncated file; retrying won't help.
+        raise UnsupportedUpload(f"Could not read image: {e}") from e
+    text = "\n\n".join(page["text"] for page in pages)
+    return {"extracted_text": text, "fields": parse_reservation_text(text), "pages": pages}
+
+job_queue.register_handler("scan", guest_service.scan_guest)
+job_queue.register_handler("ocr", _ocr_job, cleanup=discard_spool)
+job_queue.register_handler("scan_batch", scan_reservations)
+job_queue.register_handler("rescore_stars", star_rating.rescore_all)
+job_queue.register_handler("retention", retention.run_retention)
+# Not in an OCR pool process that re-imports this script as __mp_main__.
+if __name__ != "__mp_main__":
+    cold_pool.start_background_compaction()
+    retention.start_background_retention()
+
+def _job_accepted(job_id):
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+def _wants_sync():
+    return request.args.get("sync") == "1"
+
+def _cached_response(body, encoding, etag, status=200):
+    response = Response(body, status=status, mimetype="application/json")
+    response.headers["ETag"] = f'"{etag}"' if encoding == "identity" else f'"{etag}-{encoding}"'
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def guest_data_cached(view):
+    # Guest-data reads: ETag from the store's data version, so an unchanged
+    # poll is a 304 without loading or serializing anything; otherwise the
+    # serialized (and compressed) body is reused until the data changes.
+    @functools.wraps(view)
+    def cached_view(*args, **kwargs):
+        if request.args.get("format") == "ndjson":
+            return view(*args, **kwargs)
+        version = guest_store.data_version()
+        key = request.full_path
+        etag = http_cache.etag_for(version, key)
+        encoding = http_cache.choose_encoding(request.headers.get("Accept-Encoding"))
+        if_none_match = request.headers.get("If-None-Match")
+        if http_cache.etag_matches(if_none_match, etag):
+            # The 304 names the variant a 200 would carry: small bodies are
+            # never compressed. Without a cached body here, trust the client's.
+            served = (
+                http_cache.served_encoding(key, version, encoding)
+                or http_cache.matched_encoding(if_none_match, etag)
+                or encoding
+            )
+            http_cache.note_not_modified()
+            return _cached_response(b"", served, etag, status=304)
+
+        cached = http_cache.get_body(key, version, encoding)
+        if cached is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.mimetype != "application/json":
+                return response
+            cached = http_cache.put_body(key, version, response.get_data(), encoding)
+        return _cached_response(*cached, etag)
+    return cached_view
+
+def _restaurant_id(data):
+    restaurant_id = data.get("location") or guest_service.default_restaurant_id()
+    return guest_service.validate_restaurant_id(restaurant_id)
 
 @app.route("/")
 def index():
@@ -31,28 +134,403 @@ def scan_guest():
     email = data.get("email", "")
     phone = data.get("phone", "")
     party_size = data.get("party_size", "1")
+    refresh = bool(data.get("refresh"))
+    if not name:
+        return jsonify({"error": "Guest name is required"}), 400
+    try:
+        restaurant_id = _restaurant_id(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if _wants_sync():
+        profile = guest_service.scan_guest(name, email, phone, party_size, restaurant_id, refresh)
+        return jsonify(profile)
+    try:
+        job_id = job_queue.submit_job("scan", name, email, phone, party_size, restaurant_id, refresh)
+    except job_queue.QueueFull as e:
+        return jsonify({"error": f"Scan queue is full: {e}"}), 503
+    return _job_accepted(job_id)
 
-    profile = scan_new_guest(name, email, phone, party_size)
-    return jsonify(profile)
+@app.route("/scan/batch", methods=["POST"])
+def scan_batch():
+    try:
+        location = _restaurant_id(request.values)
+        if "reservations" in request.files:
+            upload = request.files["reservations"]
+            filename = (upload.filename or "").lower()
+            fmt = request.values.get("format") or ("jsonl" if filename.endswith((".jsonl", ".ndjson")) else "csv")
+            rows = list(read_reservations(upload.read().decode("utf-8-sig"), fmt))
+        elif request.is_json and isinstance(request.json, list):
+            rows = list(normalize_reservations(request.json))
+        else:
+            return jsonify({"error": "Upload a 'reservations' CSV/JSONL file or POST a JSON list"}), 400
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not read reservations: {e}"}), 400
+    try:
+        for row in rows:
+            guest_service.validate_restaurant_id(row.get("location") or location)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if _wants_sync():
+        return jsonify(scan_reservations(rows, location))
+    try:
+        job_id = job_queue.submit_job("scan_batch", rows, location)
+    except job_queue.QueueFull as e:
+        return jsonify({"error": f"Scan queue is full: {e}"}), 503
+    return _job_accepted(job_id)
 
 @app.route("/ocr", methods=["POST"])
 def ocr_upload():
-    if "image" not in request.files:
+    # Accepts a multipart "image" field or a raw image/PDF body; either way the
+    # upload is spooled to disk in chunks and never read into memory whole.
+    if request.mimetype.startswith("image/") or request.mimetype == "application/pdf":
+        stream = request.stream
+    elif "image" in request.files:
+        stream = request.files["image"].stream
+    else:
         return jsonify({"error": "No image file uploaded"}), 400
+    try:
+        spool_path = spool_upload(stream)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    try:
+        check_upload(spool_path)
+    except UnsupportedUpload as e:
+        discard_spool(spool_path)
+        return jsonify({"error": str(e)}), 415
+
+    if request.args.get("format") == "ndjson":
+        # One line per page as it is read, for long TIFF/PDF exports.
+        def stream_pages():
+            try:
+                for page in ocr_pages(spool_path):
+                    yield json.dumps(_ocr_page(page)) + "\n"
+            finally:
+                discard_spool(spool_path)
+
+        return Response(stream_with_context(stream_pages()), mimetype="application/x-ndjson")
+    if _wants_sync():
+        try:
+            return jsonify(_ocr_job(spool_path))
+        except UnsupportedUpload as e:
+            return jsonify({"error": str(e)}), 400
+        finally:
+            discard_spool(spool_path)
+    try:
+        job_id = job_queue.submit_job("ocr", spool_path)
+    except job_queue.QueueFull as e:
+        discard_spool(spool_path)
+        return jsonify({"error": f"OCR queue is full: {e}"}), 503
+    return _job_accepted(job_id)
+
+@app.route("/search/cache", methods=["GET"])
+def search_cache_stats():
+    return jsonify(search_cache.cache_stats())
+
+@app.route("/search/refresh", methods=["POST"])
+def search_refresh():
+    data = request.json or {}
+    result = search_cache.cached_guest_search(
+        data.get("name", ""), data.get("email", ""), data.get("phone", ""), refresh=True
+    )
+    return jsonify(result)
+
+@app.route("/api/usage", methods=["GET"])
+def api_usage():
+    return jsonify({
+        "today": api_usage_tracker.get_usage(),
+        "history": api_usage_tracker.usage_history(request.args.get("days", 7, type=int)),
+    })
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/ocr/batch", methods=["POST"])
+def ocr_batch_upload():
+    image_files = request.files.getlist("images")
+    if not image_files:
+        return jsonify({"error": "No image files uploaded"}), 400
+
+    # Workers read each spooled file themselves instead of receiving its bytes.
+    spooled = []
+    try:
+        for index, image_file in enumerate(image_files):
+            spooled.append((image_file.filename or f"image_{index}", spool_upload(image_file.stream)))
+    except UploadTooLarge as e:
+        for _, path in spooled:
+            discard_spool(path)
+        return jsonify({"error": f"{image_files[len(spooled)].filename}: {e}"}), 413
+
+    def stream():
+        try:
+            for result in ocr_batch(spooled):
+                if "text" in result:
+                    result["fields"] = parse_reservation_text(result["text"])
+                yield json.dumps(result) + "\n"
+        finally:
+            for _, path in spooled:
+                discard_spool(path)
+
+    return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
 
-    image_file = request.files["image"]
-    img = Image.open(image_file)
-    text = pytesseract.image_to_string(img)
+QUEUE_FILTERS = {
+    "min_risk": int,
+    "max_risk": int,
+    "star_rating": int,
+    "location": str,
+    "name_prefix": str,
+    "email": str,
+    "phone": str,
+    "keyword": str,
+}
+QUEUE_PAGE_LIMIT = 500
 
-    return jsonify({"extracted_text": text})
+def _encode_cursor(name):
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor):
+    # validate=True: a mangled cursor is an error, not a silent restart from page one.
+    name = base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    if not name:
+        raise ValueError("empty cursor")
+    return name
+
+@app.route("/guests/lookup", methods=["GET"])
+@guest_data_cached
+def lookup_guests():
+    criteria = {key: request.args[key] for key in ("email", "phone", "keyword") if key in request.args}
+    if not criteria:
+        return jsonify({"error": "email, phone or keyword is required"}), 400
+    return jsonify(dict(guest_store.find_guests(**criteria)))
+
+@app.route("/guests/<name>/visits", methods=["GET"])
+def guest_visit_history(name):
+    return jsonify(guest_store.guest_visits(name, limit=request.args.get("limit", type=int)))
+
+@app.route("/locations/<restaurant_id>/report", methods=["GET"])
+def location_visit_report(restaurant_id):
+    return jsonify(guest_store.location_report(
+        restaurant_id, start=request.args.get("start"), end=request.args.get("end")
+    ))
+
+@app.route("/guests/<name>/aliases", methods=["POST"])
+def tag_guest_alias(name):
+    data = request.json or {}
+    alias = data.get("alias", "")
+    if not alias:
+        return jsonify({"error": "Alias is required"}), 400
+    note = data.get("note") or f"Alias {alias} linked manually to this guest after confirmed review."
+    try:
+        guest = guest_service.tag_alias(name, alias, data.get("text", ""), "Manual Tag", note)
+    except guest_service.UnknownGuest:
+        return jsonify({"error": "Guest not found"}), 404
+    return jsonify(guest)
+
+@app.route("/ghosts", methods=["GET"])
+@guest_data_cached
+def list_ghost_guests():
+    return jsonify(guest_service.list_ghosts())
+
+@app.route("/ghosts/<ghost_key>/convert", methods=["POST"])
+def convert_ghost_guest(ghost_key):
+    data = request.json or {}
+    if not data.get("name"):
+        return jsonify({"error": "Real guest name is required"}), 400
+    try:
+        guest = guest_service.convert_ghost(
+            ghost_key, data["name"], data.get("email", ""), data.get("phone", ""), data.get("party_size", "")
+        )
+    except guest_service.UnknownGuest:
+        return jsonify({"error": "Ghost guest not found"}), 404
+    return jsonify(guest)
+
+@app.route("/cold_pool", methods=["GET"])
+def list_cold_pool():
+    after = request.args.get("cursor", 0, type=int)
+    limit = min(request.args.get("limit", COLD_POOL_PAGE_SIZE, type=int), QUEUE_PAGE_LIMIT)
+    if limit < 1:
+        return jsonify({"error": "Invalid query parameter: limit must be at least 1"}), 400
+    try:
+        entries, next_cursor = cold_pool.list_entries(after, limit)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"entries": entries, "next_cursor": next_cursor, "total": cold_pool.pool_size()})
+
+@app.route("/cold_pool/<int:entry_id>/tag", methods=["POST"])
+def tag_cold_pool_entry(entry_id):
+    data = request.json or {}
+    alias, real_name = data.get("alias", ""), data.get("name", "")
+    if not alias or not real_name:
+        return jsonify({"error": "Alias and guest name are required"}), 400
+    entry = cold_pool.get_entry(entry_id)
+    if entry is None:
+        return jsonify({"error": "Cold pool entry not found"}), 404
+    note = f"Alias {alias} linked from Cold Pool to this guest."
+    try:
+        guest = guest_service.tag_alias(real_name, alias, entry["text"], "Cold Pool Tag", note)
+    except guest_service.UnknownGuest:
+        return jsonify({"error": "Guest not found"}), 404
+    cold_pool.remove_entry(entry_id)
+    return jsonify(guest)
+
+@app.route("/cold_pool/<int:entry_id>", methods=["DELETE"])
+def dismiss_cold_pool_entry(entry_id):
+    if cold_pool.get_entry(entry_id) is None:
+        return jsonify({"error": "Cold pool entry not found"}), 404
+    cold_pool.remove_entry(entry_id)
+    return "", 204
 
 @app.route("/queue", methods=["GET"])
+@guest_data_cached
 def guest_queue():
+    # No query parameters: legacy behaviour, the whole guest DB as one object.
+    if not request.args:
+        try:
+            db = load_guest_db()
+            with metrics.timed("json_serialize"):
+                return jsonify(db)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    try:
+        filters = {
+            key: convert(request.args[key])
+            for key, convert in QUEUE_FILTERS.items() if key in request.args
+        }
+        cursor = request.args.get("cursor")
+        after = _decode_cursor(cursor) if cursor else None
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be at least 1")
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+
+    if request.args.get("format") == "ndjson":
+        def stream():
+            for name, info in guest_store.query_guests(after=after, limit=limit, **filters):
+                yield json.dumps({"name": name, "guest": info}) + "\n"
+        return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+    limit = min(limit or 50, QUEUE_PAGE_LIMIT)
     try:
-        db = load_guest_db()
-        return jsonify(db)
+        # Fetch one extra row to learn whether another page exists.
+        page = list(guest_store.query_guests(after=after, limit=limit + 1, **filters))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    next_cursor = _encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+    with metrics.timed("json_serialize"):
+        return jsonify({
+            "guests": dict(page[:limit]),
+            "next_cursor": next_cursor,
+        })
+
+@app.route("/queue/cache", methods=["GET"])
+def guest_queue_cache():
+    return jsonify(dict(guest_store.cache_stats(), http=http_cache.cache_stats()))
+
+def _sse(event, seq, data):
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/events", methods=["GET"])
+def guest_events():
+    # Server-sent events for guest changes (added, updated, removed, converted,
+    # alias_tagged). A reconnecting EventSource sends Last-Event-ID and gets
+    # what it missed; ?after= does the same for the first connection. Without
+    # either the stream starts at the current end of the feed. Streams are
+    # capped per worker and time-limited; see EVENTS_MAX_STREAMS in config.
+    after = request.headers.get("Last-Event-ID") or request.args.get("after")
+    if after is not None and not after.isdigit():
+        return jsonify({"error": "Last-Event-ID must be an event seq"}), 400
+    if not change_feed.open_stream():
+        response = jsonify({"error": "Too many open event streams on this worker"})
+        response.headers["Retry-After"] = str(EVENTS_RETRY_MS // 1000 or 1)
+        return response, 503
+    try:
+        latest = change_feed.latest_seq()
+    except BaseException:
+        change_feed.close_stream()
+        raise
+
+    def stream():
+        deadline = time.monotonic() + EVENTS_STREAM_MAX_SECONDS
+        position = latest if after is None else int(after)
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        if after is not None and change_feed.missed(position):
+            # Those events were pruned; the client reloads /queue and goes on from here.
+            position = latest
+            yield _sse("reset", position, {"seq": position})
+        while time.monotonic() < deadline:
+            events = change_feed.wait_for_events(position, EVENTS_KEEPALIVE_SECONDS)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield _sse(event["event"], event["seq"], event)
+            position = events[-1]["seq"]
+
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+    # Runs when the server closes the response, even if the client left before
+    # the first byte; the generator's own cleanup would not run then.
+    response.call_on_close(change_feed.close_stream)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/stars/rescore", methods=["POST"])
+def rescore_star_ratings():
+    if _wants_sync():
+        return jsonify(star_rating.rescore_all())
+    try:
+        job_id = job_queue.submit_job("rescore_stars")
+    except job_queue.QueueFull as e:
+        return jsonify({"error": f"Job queue is full: {e}"}), 503
+    return _job_accepted(job_id)
+
+@app.route("/retention/run", methods=["POST"])
+def run_retention():
+    if _wants_sync():
+        return jsonify(retention.run_retention())
+    try:
+        job_id = job_queue.submit_job("retention")
+    except job_queue.QueueFull as e:
+        return jsonify({"error": f"Job queue is full: {e}"}), 503
+    return _job_accepted(job_id)
+
+@app.route("/shared/locations", methods=["GET"])
+def shared_locations():
+    return jsonify(shared_sync.locations())
+
+@app.route("/shared/changes", methods=["GET"])
+def shared_changes():
+    location = request.args.get("location")
+    if not location:
+        return jsonify({"error": "location is required"}), 400
+    since = request.args.get("since", 0, type=int)
+    limit = min(request.args.get("limit", SHARED_SYNC_BATCH, type=int), SHARED_SYNC_BATCH)
+    return jsonify({"location": location, "changes": shared_sync.changes_since(location, since, limit)})
+
+@app.route("/shared/notes", methods=["POST"])
+def add_shared_note():
+    data = request.json or {}
+    if not data.get("name") or not data.get("note"):
+        return jsonify({"error": "Guest name and note are both required"}), 400
+    return jsonify(shared_sync.add_note(data["name"], data["note"])), 201
+
+@app.route("/shared/sync", methods=["POST"])
+def sync_shared_notes():
+    try:
+        return jsonify(shared_sync.sync_peers())
+    except shared_sync.LocationNotConfigured as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file